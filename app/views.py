@@ -1,10 +1,92 @@
 from bson import json_util
-from flask import Flask, jsonify, Markup, render_template, request
+import calendar
+from flask import Flask, Response, jsonify, Markup, render_template, request
 from app import app
+import gzip
+from io import BytesIO
 import json
 import pandas as pd
 
-from nflfanfare import stats
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
+
+from nflfanfare import cache, drives, games, stats, stream, teams
+
+# Minimum response size in bytes to gzip
+GZIP_MIN_SIZE = 1024
+
+# Seconds between keepalive comments on idle game streams
+KEEPALIVE = 15
+
+# Milliseconds before clients reconnect to a closed game stream
+RECONNECT = 60000
+
+
+def _timestamp(date):
+    ''' Returns the UTC timestamp of a datetime
+    '''
+    return calendar.timegm(date.utctimetuple())
+
+
+def _not_modified(version, modified):
+    ''' Returns true if the client's cached copy is current based on
+        the If-None-Match and If-Modified-Since request headers
+    '''
+    if request.if_none_match:
+        return version is not None and \
+            request.if_none_match.contains_weak(version)
+    if request.if_modified_since and modified:
+        return (_timestamp(request.if_modified_since) >=
+                _timestamp(modified))
+    return False
+
+
+def _conditional(version, modified, build):
+    ''' Returns a JSON response with ETag and Last-Modified headers.
+        Answers 304 Not Modified without building the body when the
+        client's cached copy is current. The body is built for the
+        same version as the ETag.
+    '''
+    if _not_modified(version, modified):
+        response = Response(status=304)
+    else:
+        response = Response(build(version), mimetype='application/json')
+
+    # Clients revalidate on every request
+    if version:
+        response.set_etag(version, weak=True)
+    if modified:
+        response.last_modified = modified
+    response.cache_control.no_cache = True
+
+    return response
+
+
+@app.after_request
+def compress(response):
+    ''' Gzips large responses for clients that accept it
+    '''
+    if (response.status_code != 200 or response.is_streamed or
+            response.direct_passthrough or
+            'Content-Encoding' in response.headers or
+            'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    buf = BytesIO()
+    with gzip.GzipFile(mode='wb', fileobj=buf) as f:
+        f.write(data)
+
+    response.set_data(buf.getvalue())
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+
+    return response
 
 
 @app.route('/')
@@ -28,14 +110,32 @@ def tweetcount():
     week = request.args.get('week')
     if week == 'None':
         week = None
-    df = stats.schedule(week)
-    return df.to_json(orient='records')
+
+    def build(version):
+        # Return cached tweet counts of this version if available
+        key = cache.key('tweetcount', week, version)
+        body = cache.responses.get(key)
+        if body is None:
+            df = stats.schedule(week, materialized=True)
+            body = df.to_json(orient='records')
+
+            # Cache based on the states of the week's games
+            cache.responses.set(key, body, cache.ttl(list(df.state)),
+                                tags=list(df['Game ID']))
+        return body
+
+    version, modified = stats.week_version(week)
+    return _conditional(version, modified, build)
 
 
 @app.route('/teaminfo')
 def teaminfo():
-    df = stats.teams_list()
-    return df.to_json(orient='records')
+    body = teams.teams().to_json(orient='records')
+
+    # Version the team information by content
+    response = Response(body, mimetype='application/json')
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.route('/game', methods=['GET'])
@@ -49,8 +149,83 @@ def gamedata():
     # Parse gameid from get request
     gameid = request.args.get('gameid')
 
-    # Sentiment data frame from gameid
-    data = stats.Game(gameid).data()
+    def build(version):
+        # Return cached game data of this version if available
+        key = cache.key('gamedata', gameid, version)
+        body = cache.responses.get(key)
+        if body is None:
+            # Sentiment data frame from gameid
+            data = stats.Game(gameid, server=True).data()
+            body = json.dumps(data, default=json_util.default)
+
+            # Cache based on the state of the game
+            cache.responses.set(key, body, cache.ttl([data.get('state')]),
+                                tags=[gameid])
+        return body
 
     # Return sentiment markup
-    return json.dumps(data, default=json_util.default)
+    version, modified = stats.game_version(gameid)
+    return _conditional(version, modified, build)
+
+
+@app.route('/drivedata', methods=['GET'])
+def drivedata():
+    # Parse gameid from get request
+    gameid = request.args.get('gameid')
+
+    def build(version):
+        # Return cached drive summaries of this version if available
+        key = cache.key('drivedata', gameid, version)
+        body = cache.responses.get(key)
+        if body is None:
+            df = drives.drives(gameid)
+            body = df.to_json(orient='records')
+
+            # Cache based on the state of the game
+            cache.responses.set(key, body,
+                                cache.ttl([games.Game(gameid).state]),
+                                tags=[gameid])
+        return body
+
+    # Drives change with the plays of the game
+    version, modified = stats.game_version(gameid)
+    if version is None:
+        return Response('[]', status=404, mimetype='application/json')
+    return _conditional(version, modified, build)
+
+
+@app.route('/gamestream', methods=['GET'])
+def gamestream():
+    # Parse gameid from get request
+    gameid = request.args.get('gameid')
+
+    def events():
+        queue = stream.subscribe(gameid)
+        try:
+            while True:
+                try:
+                    update = queue.get(timeout=KEEPALIVE)
+                except Empty:
+                    # Keep proxies from closing idle connections
+                    yield ': keepalive\n\n'
+                    continue
+
+                # Stream closed after errors, reconnect later
+                if update is None:
+                    yield 'retry: %s\n\n' % RECONNECT
+                    break
+                yield 'data: %s\n\n' % json.dumps(update,
+                                                   default=json_util.default)
+        finally:
+            stream.unsubscribe(gameid, queue)
+
+    # Stream new plays and sentiment buckets
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/cachestats')
+def cachestats():
+    return jsonify(cache.responses.stats())
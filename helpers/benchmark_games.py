@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import argparse
+from datetime import datetime, timedelta
+import os
+import pandas as pd
+import sys
+import time
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--games", type=int, default=50,
+                    help="The number of games to construct.")
+args = parser.parse_args()
+
+
+def legacy_state(start):
+    ''' Legacy game state of a single scheduled time
+    '''
+    post = start + timedelta(hours=4)
+    now = datetime.utcnow()
+    oneweek = now - timedelta(days=7)
+    upcoming = now + timedelta(hours=1)
+    starting = now + timedelta(minutes=15)
+
+    if start < oneweek:
+        return "historic"
+    elif start > oneweek and post < now:
+        return "recent"
+    elif start < now and post > now:
+        return "live"
+    elif start > now and start < starting:
+        return "starting"
+    elif start > now and start < upcoming:
+        return "upcoming"
+    elif start > datetime.now():
+        return "pending"
+    return None
+
+
+def legacy(match):
+    ''' Legacy construction loading every game with row by row states
+        to resolve the match, grouping the game tweets by team, and
+        looking up the colors up front
+    '''
+    result = ff.db.games.find({}, {'gameid': 1, 'eid': '1',
+                                   'scheduled': 1, '_id': 0})
+    df = pd.DataFrame(list(result))
+    df['state'] = df.scheduled.apply(lambda x: legacy_state(x))
+
+    query = None
+    if match in list(df.gameid):
+        query = 'gameid'
+    if match in list(df.eid):
+        query = 'eid'
+    info = ff.db.games.find_one({query: match}) if query else None
+
+    if info:
+        legacy_state(info['scheduled'])
+        list(ff.db.tweets.aggregate([
+            {'$match': {'gameid': info['gameid']}},
+            {'$group': {'_id': '$teamid', 'count': {'$sum': 1}}}]))
+        ff.teams.Team(info['hometeam']).colors
+        ff.teams.Team(info['awayteam']).colors
+    return info
+
+
+# Games to construct by gameid and EID
+result = ff.db.games.find({}, {'gameid': 1, 'eid': 1, '_id': 0}).\
+    limit(args.games)
+matches = []
+for game in result:
+    matches += [game['gameid'], game['eid']]
+
+# Legacy construction
+start = time.time()
+for match in matches:
+    legacy(match)
+legacy_time = time.time() - start
+
+# Registry construction, including loading the registry
+ff.games.invalidate()
+start = time.time()
+for match in matches:
+    ff.games.Game(match)
+lazy_time = time.time() - start
+
+# Registry construction using every attribute
+start = time.time()
+for match in matches:
+    ff.games.Game(match).details()
+details_time = time.time() - start
+
+print('Constructed %s games by gameid and EID' % len(matches))
+print('Legacy Game(...):          %.2f ms per game' %
+      (1000 * legacy_time / len(matches)))
+print('Registry Game(...):        %.2f ms per game' %
+      (1000 * lazy_time / len(matches)))
+print('Registry Game(...) + info: %.2f ms per game' %
+      (1000 * details_time / len(matches)))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+import argparse
+import copy
+import json
+import os
+import pandas as pd
+import sys
+import time
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--feed", type=str, default=None,
+                    help="A full game _gtd.json fixture to replay.")
+parser.add_argument("--plays", type=int, default=180,
+                    help="The number of synthetic plays without a fixture.")
+parser.add_argument("--interval", type=int, default=1,
+                    help="The number of new plays between polls.")
+args = parser.parse_args()
+
+
+def synthetic(n):
+    ''' Returns a synthetic game feed with n plays in drives of 6
+    '''
+    drives = {}
+    for i in range(n):
+        drive = str(i // 6 + 1)
+        drives.setdefault(drive, {'plays': {}})
+        drives[drive]['plays'][str(36 + i * 25)] = {
+            'desc': 'Synthetic play %s' % i,
+            'qtr': min(i * 4 // n + 1, 4),
+            'down': i % 4 + 1,
+            'posteam': 'HOM' if (i // 6) % 2 else 'AWY',
+            'yrdln': 'HOM 25',
+            'time': '15:00'
+        }
+    drives['crntdrv'] = n // 6 + 1
+
+    return {'home': {'score': {'T': 0}},
+            'away': {'score': {'T': 0}},
+            'drives': drives}
+
+
+def truncate(feed, n):
+    ''' Returns the feed as it looked after its first n plays
+    '''
+    partial = copy.deepcopy(feed)
+    plays = sorted([(int(d), int(p))
+                    for d in feed['drives'] if d != 'crntdrv'
+                    for p in feed['drives'][d]['plays']],
+                   key=lambda x: x[1])
+    keep = set(plays[:n])
+
+    for d in list(partial['drives']):
+        if d == 'crntdrv':
+            continue
+        partial['drives'][d]['plays'] = dict(
+            (p, v) for p, v in partial['drives'][d]['plays'].items()
+            if (int(d), int(p)) in keep)
+        if not partial['drives'][d]['plays']:
+            del partial['drives'][d]
+
+    return partial
+
+
+def legacy(game, feed):
+    ''' Legacy parse appending every play of the feed to a data frame
+    '''
+    df = pd.DataFrame()
+    drives = feed['drives']
+    for d in sorted([int(_) for _ in drives if not _ == 'crntdrv']):
+        plays = drives[str(d)]['plays']
+        for p in plays:
+            play = dict(plays[p])
+            play['gameid'] = game.info['gameid']
+            play['_id'] = game.info['gameid'] + '-' + p
+            play['playid'] = int(p)
+            play['drive'] = d
+            df = pd.concat([df, pd.Series(play).to_frame().T],
+                           ignore_index=True)
+    return df
+
+
+# Full game feed from a fixture or synthesized
+if args.feed:
+    with open(args.feed) as f:
+        feed = json.load(f)
+    feed = feed[list(feed.keys())[0]]
+else:
+    feed = synthetic(args.plays)
+
+total = sum(len(feed['drives'][d]['plays'])
+            for d in feed['drives'] if d != 'crntdrv')
+
+# Game without a database lookup
+game = ff.gc.Game.__new__(ff.gc.Game)
+game.gameid = 'BENCHMARK'
+game.info = {'gameid': game.gameid, 'hometeam': 'HOM', 'awayteam': 'AWY'}
+ff.gc._seen.pop(game.gameid, None)
+
+# Replay the feed as it grows at every poll
+legacy_times, parse_times, parsed = [], [], 0
+for n in range(args.interval, total + args.interval, args.interval):
+    partial = truncate(feed, min(n, total))
+
+    start = time.time()
+    legacy(game, partial)
+    legacy_times.append(time.time() - start)
+
+    game._get_feed = lambda: partial
+    start = time.time()
+    parsed += len(game._parse_feed())
+    parse_times.append(time.time() - start)
+
+# Every play is parsed exactly once
+assert parsed == total
+
+polls = len(parse_times)
+for name, times in [('Legacy', legacy_times), ('Incremental', parse_times)]:
+    print('%-12s first poll %.2f ms, last poll %.2f ms, total %.3f seconds' %
+          (name + ':', times[0] * 1000, times[-1] * 1000, sum(times)))
+print('Polls: %s  Plays: %s' % (polls, total))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import os
+import pandas as pd
+import sys
+import time
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--games", type=int, default=267,
+                    help="The number of synthetic games in the season.")
+parser.add_argument("--tweets", type=int, default=5000000,
+                    help="The number of synthetic tweets in the season.")
+parser.add_argument("--database", type=str, default='NFL2016_benchmark',
+                    help="The scratch database for the synthetic season.")
+parser.add_argument("--keep", action='store_true',
+                    help="Keep the scratch database after the benchmark.")
+args = parser.parse_args()
+
+
+class Scratch(type(ff.db)):
+    ''' Database handle using the scratch database
+    '''
+    @property
+    def db(self):
+        return self.client[args.database]
+
+
+def legacy():
+    ''' Legacy schedule loading every tweet into pandas and looking
+        up the counts of each game row by row
+    '''
+    search = {'seasontype': {'$ne': 'PRE'}}
+    games = pd.DataFrame(list(ff.db.games.find(search).sort('gameid', 1)))
+
+    # Tweet counts by game and team id
+    result = ff.db.tweets.find({}, {'gameid': 1, 'teamid': 1})
+    counts = pd.DataFrame(list(result))
+    counts = counts.groupby(['gameid', 'teamid']).agg({'_id': 'count'}).\
+        reset_index().rename(columns={'_id': 'tweets'})
+
+    def lookup(x, team):
+        result = counts[(counts.gameid == x['gameid']) &
+                        (counts.teamid == x[team])].tweets
+        if result.empty:
+            return 0
+        return int(result.iloc[0])
+
+    games['hometweets'] = games.apply(lambda x: lookup(x, 'hometeam'), axis=1)
+    games['awaytweets'] = games.apply(lambda x: lookup(x, 'awayteam'), axis=1)
+    games['totaltweets'] = games.hometweets + games.awaytweets
+    games['state'] = games.scheduled.apply(ff.games._state)
+    return games.rename(columns={'gameid': 'Game ID'})
+
+
+# Synthetic season of games between 32 teams
+np.random.seed(0)
+teams = np.array(['T%02d' % _ for _ in range(32)])
+matchups = np.array([np.random.choice(teams, 2, replace=False)
+                     for _ in range(args.games)])
+kickoff = datetime(2016, 9, 11, 17, 0)
+games = [{'_id': 'G%04d' % i,
+          'gameid': 'G%04d' % i,
+          'eid': 'E%04d' % i,
+          'week': str(i // 16 + 1),
+          'seasontype': 'REG',
+          'hometeam': str(matchups[i, 0]),
+          'awayteam': str(matchups[i, 1]),
+          'scheduled': kickoff + timedelta(weeks=i // 16)}
+         for i in range(args.games)]
+
+ff.db = Scratch()
+try:
+    # Load the synthetic season into the scratch database
+    ff.db.db.games.drop()
+    ff.db.db.tweets.drop()
+    ff.db.games.insert_many(games)
+
+    game = np.random.randint(0, args.games, args.tweets)
+    side = np.random.randint(0, 2, args.tweets)
+    for start in range(0, args.tweets, 100000):
+        end = min(start + 100000, args.tweets)
+        ff.db.tweets.insert_many([
+            {'tweetid': i,
+             'gameid': games[game[i]]['gameid'],
+             'teamid': str(matchups[game[i], side[i]]),
+             'sentiment': {'sent_compound': 0}}
+            for i in range(start, end)], ordered=False)
+    ff.db.ensure_indexes(['games', 'tweets'])
+
+    # Legacy schedule
+    start = time.time()
+    before = legacy()
+    legacy_time = time.time() - start
+
+    # Schedule counted by the server-side $group
+    start = time.time()
+    after = ff.stats.schedule()
+    group_time = time.time() - start
+
+    # Schedule from the counts stored on the games
+    ff.games.reconcile_tweet_counts()
+    start = time.time()
+    stored = ff.stats.schedule(materialized=True)
+    stored_time = time.time() - start
+
+    # Check all methods agree
+    for df in [after, stored]:
+        assert list(before['Game ID']) == list(df['Game ID'])
+        assert (before.hometweets.values == df.hometweets.values).all()
+        assert (before.awaytweets.values == df.awaytweets.values).all()
+
+finally:
+    if not args.keep:
+        ff.db.client.drop_database(args.database)
+
+print('Schedule of %s games and %s tweets' % (args.games, args.tweets))
+print('Legacy schedule:       %.3f seconds' % legacy_time)
+print('$group schedule:       %.3f seconds' % group_time)
+print('Stored count schedule: %.3f seconds' % stored_time)
+print('Speedup:               %.0fx' % (legacy_time / group_time))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import argparse
+from bs4 import BeautifulSoup
+from datetime import datetime, timedelta
+import glob
+import os
+import pandas as pd
+import pytz
+import sys
+import time
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--fixtures", type=str, default=None,
+                    help="A directory of weekly scorestrip XML fixtures.")
+parser.add_argument("--weeks", type=int, default=17,
+                    help="The number of synthetic weeks without fixtures.")
+parser.add_argument("--repeat", type=int, default=10,
+                    help="The number of times to parse the season.")
+args = parser.parse_args()
+
+
+def synthetic(week):
+    ''' Returns a synthetic scorestrip week of 16 games
+    '''
+    sunday = datetime(2016, 9, 11) + timedelta(weeks=week - 1)
+    games = []
+    for i in range(16):
+        day = sunday - timedelta(days=3) if i == 0 else sunday
+        clock = ['9:30', '1:00', '4:05', '4:25', '8:30'][i % 5]
+        eid = '%s%02d' % (day.strftime('%Y%m%d'), i)
+        games.append('<g eid="%s" gsis="%s" d="Sun" t="%s" q="F" '
+                     'h="H%02d" hnn="home" hs="21" v="V%02d" vnn="away" '
+                     'vs="17" rz="0" ga="" gt="REG"/>' %
+                     (eid, 50000 + week * 100 + i, clock, i, i))
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<ss><gms w="%s" y="2016" t="R" gd="0" bph="0">%s</gms></ss>' %
+            (week, ''.join(games)))
+
+
+def legacy(xml):
+    ''' Legacy parse with BeautifulSoup and row by row localization
+    '''
+    soup = BeautifulSoup(xml, 'html.parser')
+    week = soup.find_all('gms')[0].attrs
+    df = pd.DataFrame([_.attrs for _ in soup.find_all('g')])
+
+    gdate = df.eid.apply(lambda x: x[:-2])
+    gtime = df.t.apply(lambda x: x + ' AM' if x == '9:30' else x + ' PM')
+    df['scheduled'] = pd.to_datetime(gdate + ' ' + gtime)
+    df['scheduled'] = df.scheduled.apply(
+        lambda x: pytz.timezone('US/Eastern').localize(x))
+    df['scheduled'] = df.scheduled.apply(
+        lambda x: x.astimezone(pytz.timezone('UTC')))
+    df['week'] = week['w']
+    return df
+
+
+# Weekly scorestrip fixtures or a synthetic season
+if args.fixtures:
+    weeks = []
+    for name in sorted(glob.glob(os.path.join(args.fixtures, '*.xml'))):
+        with open(name) as f:
+            weeks.append(f.read())
+else:
+    weeks = [synthetic(_) for _ in range(1, args.weeks + 1)]
+
+schedule = ff.gc.Schedule()
+
+# Legacy parse
+start = time.time()
+for _ in range(args.repeat):
+    before = [legacy(xml) for xml in weeks]
+legacy_time = time.time() - start
+
+# Single pass parse
+start = time.time()
+for _ in range(args.repeat):
+    after = [schedule._parse_games(xml) for xml in weeks]
+vector_time = time.time() - start
+
+# Check the scheduled times agree
+for b, a in zip(before, after):
+    assert list(pd.to_datetime(b.scheduled, utc=True)) == \
+        list(pd.to_datetime(a.scheduled, utc=True))
+
+games = sum(len(_) for _ in after)
+print('Parsed %s weeks, %s games, %s times' %
+      (len(weeks), games, args.repeat))
+print('Legacy parse:      %.3f seconds' % legacy_time)
+print('Single pass parse: %.3f seconds' % vector_time)
+print('Speedup:           %.0fx' % (legacy_time / vector_time))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+from nflfanfare import sentiment
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--tweets", type=int, default=100000,
+                    help="The number of synthetic tweets to score.")
+parser.add_argument("--legacy", type=int, default=1000,
+                    help="The number of tweets scored with the legacy "
+                         "analyzer per tweet. Rates are extrapolated.")
+args = parser.parse_args()
+
+# Synthetic corpus of game day tweets
+words = ['touchdown', 'interception', 'fumble', 'great', 'terrible',
+         'awesome', 'refs', 'worst', 'best', 'win', 'lose', 'love',
+         'hate', 'defense', 'offense', 'kick', 'sack', 'catch', 'drop',
+         'penalty', 'lol', 'wow', 'ugh', 'yes', 'no', 'amazing', 'bad']
+hashtags = ['#GoPats', '#FlyEaglesFly', '#HereWeGo', '#Skol', '#GoHawks']
+
+random.seed(0)
+corpus = [' '.join(random.sample(words, random.randint(4, 12)) +
+                   [random.choice(hashtags)])
+          for _ in range(args.tweets)]
+
+# Legacy scoring builds an analyzer for each tweet
+start = time.time()
+for text in corpus[:args.legacy]:
+    SentimentIntensityAnalyzer().polarity_scores(text)
+legacy = args.legacy / (time.time() - start)
+
+# Shared analyzer scoring the corpus in one batch
+sentiment.analyzer()
+start = time.time()
+sentiment.scores(corpus)
+shared = args.tweets / (time.time() - start)
+
+print('Legacy analyzer per tweet: %.0f tweets/second' % legacy)
+print('Shared batch analyzer:     %.0f tweets/second' % shared)
+print('Speedup:                   %.1fx' % (shared / legacy))
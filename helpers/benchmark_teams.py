@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import random
+import sys
+import time
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--lookups", type=int, default=1000000,
+                    help="The number of team lookups to resolve.")
+parser.add_argument("--legacy", type=int, default=1000,
+                    help="The number of lookups resolved with the legacy "
+                         "data frame scan. Timings are extrapolated.")
+args = parser.parse_args()
+
+
+def legacy_info(df, match):
+    ''' Legacy team resolution scanning the teams data frame.
+        The data frame is loaded once, so the database round trip
+        the legacy implementation made per lookup is not counted.
+    '''
+    df = df.copy()
+    df['fullname'] = (df.teamcity + ' ' + df.teamname)
+
+    column = None
+    for name in ['teamid', 'pfrid', 'username', 'fullname', 'teamname']:
+        if match in list(df[name]):
+            column = name
+    if match in [_ for h in list(df.hashtags) for _ in h]:
+        hashstr = df.hashtags.apply(lambda x: ' '.join(x))
+        return df[hashstr.str.contains(match)].to_dict(orient='records')[0]
+    if column:
+        return df[df[column] == match].to_dict(orient='records')[0]
+    return None
+
+
+# Lookup keys drawn from every identifier type
+teams = ff.teams.teams()
+keys = (list(teams.teamid) + list(teams.pfrid) + list(teams.username) +
+        list(teams.teamcity + ' ' + teams.teamname) + list(teams.teamname) +
+        [_ for h in teams.hashtags for _ in h])
+
+random.seed(0)
+lookups = [random.choice(keys) for _ in range(args.lookups)]
+
+# Legacy data frame scan
+start = time.time()
+for match in lookups[:args.legacy]:
+    legacy_info(teams, match)
+legacy = (time.time() - start) / args.legacy * args.lookups
+
+# Shared team registry
+ff.teams.registry()
+start = time.time()
+for match in lookups:
+    ff.teams.Team(match)
+shared = time.time() - start
+
+print('Legacy data frame scan: %.1f seconds for %s lookups (extrapolated)'
+      % (legacy, args.lookups))
+print('Team registry:          %.1f seconds for %s lookups'
+      % (shared, args.lookups))
+print('Speedup:                %.0fx' % (legacy / shared))
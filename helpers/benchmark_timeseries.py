@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import os
+import pandas as pd
+import sys
+import time
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Parse the benchmark options
+parser = argparse.ArgumentParser()
+parser.add_argument("--tweets", type=int, default=60000,
+                    help="The number of synthetic tweets in the game.")
+parser.add_argument("--buckets", type=int, default=5,
+                    help="The number of minutes in each time bucket.")
+args = parser.parse_args()
+
+
+class SyntheticGame:
+    ''' Game window for a 1pm Eastern kickoff
+    '''
+    scheduled = datetime(2016, 9, 11, 17, 0)
+    pregame = scheduled - timedelta(hours=1)
+    postgame = scheduled + timedelta(hours=4)
+
+
+def legacy(game, df, x, time_column):
+    ''' Legacy bucketing by time of day for each time bucket
+    '''
+    minutes = int((game.postgame - game.pregame).seconds / 60)
+    times = [game.pregame + timedelta(minutes=_)
+             for _ in range(0, minutes, x)]
+
+    tindex = pd.DatetimeIndex(df[time_column])
+    for i in range(0, len(times)):
+        index = tindex.indexer_between_time(
+            times[i].time(),
+            (times[i] + timedelta(minutes=x)).time(),
+            include_end=False)
+        df.loc[index, 'timegroup'] = i
+        df.loc[index, 'gametime'] = times[i]
+
+    return df
+
+
+# Synthetic tweets posted within the game window
+np.random.seed(0)
+seconds = np.random.randint(0, 5 * 60 * 60, args.tweets)
+tweets = pd.DataFrame({
+    'postedtime': [SyntheticGame.pregame + timedelta(seconds=int(_))
+                   for _ in seconds],
+    'sent_compound': np.random.uniform(-1, 1, args.tweets)
+})
+
+# Legacy bucketing
+start = time.time()
+before = legacy(SyntheticGame, tweets.copy(), args.buckets, 'postedtime')
+legacy_time = time.time() - start
+
+# Single pass bucketing
+stats = ff.stats.Game.__new__(ff.stats.Game)
+stats.game = SyntheticGame
+start = time.time()
+after = stats._timeseries(tweets.copy(), args.buckets, 'postedtime')
+vector_time = time.time() - start
+
+# Check the buckets agree for tweets within the game window
+assert (before.timegroup.values == after.timegroup.values).all()
+assert (pd.to_datetime(before.gametime).values ==
+        pd.to_datetime(after.gametime).values).all()
+
+print('Legacy bucketing:      %.3f seconds' % legacy_time)
+print('Single pass bucketing: %.3f seconds' % vector_time)
+print('Speedup:               %.0fx' % (legacy_time / vector_time))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+from multiprocessing import Pool
+import os
+import sys
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+log = logging.getLogger('helpers.build_snapshots')
+
+# Parse the backfill options
+parser = argparse.ArgumentParser()
+parser.add_argument("--processes", type=int, default=4,
+                    help="The number of worker processes.")
+args = parser.parse_args()
+
+
+def build(gameid):
+    ''' Builds the snapshot for a game in a worker process
+    '''
+    try:
+        return gameid, ff.stats.build_snapshot(gameid)
+    except:
+        log.error('Could not build snapshot for %s: %s' %
+                  (gameid, sys.exc_info()[1]))
+        return gameid, False
+
+
+# Build snapshots for every historic game in parallel
+games = ff.games.games('historic')
+gameids = list(games.gameid) if not games.empty else []
+
+pool = Pool(args.processes)
+built = 0
+for gameid, result in pool.imap_unordered(build, gameids):
+    if result:
+        built += 1
+        log.info('Built snapshot for %s.' % gameid)
+pool.close()
+pool.join()
+
+print('Built %s of %s historic game snapshots.' % (built, len(gameids)))
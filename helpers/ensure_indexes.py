@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import logging
+import os
+import sys
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+log = logging.getLogger('helpers.ensure_indexes')
+
+# Remove duplicates that would prevent unique indexes
+removed = ff.db.dedupe()
+for collection in sorted(removed):
+    if removed[collection]:
+        log.warn('Removed %s duplicate documents from %s.' %
+                 (removed[collection], collection))
+        print('%s: removed %s duplicates' % (collection,
+                                             removed[collection]))
+if removed.get('tweets'):
+    print('Run update_tweet_counts.py to repair the stored tweet counts.')
+
+# Create the required indexes
+created = ff.db.ensure_indexes()
+for collection in sorted(created):
+    for name in created[collection]:
+        log.info('Index %s is present on %s.' % (name, collection))
+        print('%s: %s' % (collection, name))
+
+# Report hot path queries that still scan a collection
+scans = ff.db.scans()
+for scan in scans:
+    log.warn('Query %s on %s runs as a collection scan.' %
+             (scan['query'], scan['collection']))
+    print('COLLSCAN %s: %s (%s)' % (scan['collection'], scan['query'],
+                                    ' <- '.join(scan['stages'])))
+if not scans:
+    print('No hot path queries run as collection scans.')
@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 
-from datetime import datetime
+import argparse
 import logging
 import os
-import pytz
+import subprocess
 import sys
+import time
 
 path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if path not in sys.path:
@@ -15,9 +16,118 @@ import nflfanfare as ff
 
 log = logging.getLogger('helpers.start_collector')
 
-now = pytz.timezone('UTC').localize(datetime.utcnow())
-now = now.astimezone(pytz.timezone('US/Eastern'))
+# Parse the scheduler options
+parser = argparse.ArgumentParser()
+parser.add_argument("--scores-interval", type=int, default=15,
+                    help="The seconds between scorestrip polls.")
+args = parser.parse_args()
 
-if (now.hour >= 8) or (now.hour < 2):
-    log.info('Collector started.')
-    ff.gc.Collector()._spawn()
+# Starting and live games, games that have gone final, and recent
+# games waiting for their live tweet collection to finish
+active = set()
+final = set()
+recent = set()
+
+
+def spawn(helper, gameid):
+    ''' Starts a monitoring helper for a game in a new process
+    '''
+    subprocess.Popen(['python', ff.sec.helper_path + helper,
+                      '--gameid', gameid],
+                     stdin=None,
+                     stdout=None,
+                     stderr=None,
+                     close_fds=True)
+
+
+def dispatch(gameid, state):
+    ''' Starts the play and tweet monitors of a game when its
+        state changes unless they are already running
+    '''
+    # Poll the scorestrip while games are starting or live
+    live = state in ['starting', 'live'] and gameid not in final
+    if live:
+        active.add(gameid)
+    else:
+        active.discard(gameid)
+
+    # Collect recent tweets once the live collection has finished
+    if state == 'recent':
+        recent.add(gameid)
+    if state == 'historic':
+        recent.discard(gameid)
+
+    game = ff.db.games.find_one({'gameid': gameid},
+                                {'updating': 1, 'twitter': 1})
+    if not game:
+        return
+
+    if live and not game.get('updating'):
+        log.info('Starting play monitor for %s game %s.' % (state, gameid))
+        spawn('monitor_game.py', gameid)
+
+    if (state in ['upcoming', 'starting', 'live'] and
+            not game.get('twitter')):
+        log.info('Starting tweet monitor for %s game %s.' % (state, gameid))
+        spawn('monitor_tweets.py', gameid)
+
+
+def collect_recent():
+    ''' Starts recent tweet collection for games whose live
+        collection has finished
+    '''
+    for gameid in list(recent):
+        game = ff.db.games.find_one({'gameid': gameid}, {'twitter': 1})
+        if game and game.get('twitter'):
+            continue
+
+        recent.discard(gameid)
+        if game:
+            log.info('Starting tweet monitor for recent game %s.' % gameid)
+            spawn('monitor_tweets.py', gameid)
+
+
+def scores(collector):
+    ''' Polls the scorestrip so the play monitors see games go final
+    '''
+    changed = collector._poll()
+    for i, game in changed.iterrows():
+        if game['status'] in ['F', 'FO']:
+            final.add(game['gameid'])
+            active.discard(game['gameid'])
+
+
+try:
+    # Sleep until each game state transition, polling the scorestrip
+    # while games are starting or live
+    scheduler = ff.lifecycle.Scheduler(dispatch)
+    collector = ff.gc.Collector(update=False)
+    log.info('Lifecycle scheduler started.')
+
+    while True:
+        try:
+            scheduler.step()
+            collect_recent()
+            if active:
+                scores(collector)
+        except KeyboardInterrupt:
+            raise
+        except:
+            log.error('Unknown error: %s line %s: %s' %
+                      (sys.exc_info()[0],
+                       sys.exc_info()[2].tb_lineno,
+                       sys.exc_info()[1]))
+
+        seconds = scheduler.seconds()
+        if active or recent:
+            seconds = min(seconds, args.scores_interval)
+        time.sleep(seconds)
+
+except KeyboardInterrupt:
+    log.info('Collector interrupted.')
+
+except:
+    log.error('Unknown error: %s line %s: %s' %
+              (sys.exc_info()[0],
+               sys.exc_info()[2].tb_lineno,
+               sys.exc_info()[1]))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import os
+import sys
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if path not in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+log = logging.getLogger('helpers.supervise')
+
+# Parse the supervisor options
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", type=int, default=32,
+                    help="The maximum number of concurrent game tasks.")
+parser.add_argument("--interval", type=int, default=60,
+                    help="The seconds between schedule checks.")
+parser.add_argument("--scores-interval", type=int, default=15,
+                    help="The seconds between scorestrip polls.")
+args = parser.parse_args()
+
+try:
+    # Ensure indexes before monitoring
+    ff.db.ensure_indexes()
+
+    # Monitor all live games in this process
+    ff.supervisor.Supervisor(max_workers=args.workers,
+                             interval=args.interval,
+                             scores_interval=args.scores_interval).run()
+
+except KeyboardInterrupt:
+    log.info('Supervisor interrupted.')
+
+except:
+    log.error('Unknown error: %s line %s: %s' %
+              (sys.exc_info()[0],
+               sys.exc_info()[2].tb_lineno,
+               sys.exc_info()[1]))
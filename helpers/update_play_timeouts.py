@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+import os, sys
+from pymongo import UpdateOne
+
+path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if not path in sys.path:
+    sys.path.insert(1, path)
+del path
+
+import nflfanfare as ff
+
+# Store timeouts on plays collected before they were computed at ingest
+gameids = ff.db.plays.distinct('gameid', {'hometimeouts': {'$exists': False}})
+for gameid in gameids:
+    plays = ff.plays.Plays(gameid)
+    if not plays.game.info or plays.plays is None:
+        continue
+
+    ff.db.plays.bulk_write(
+        [UpdateOne({'_id': r['_id']},
+                   {'$set': {'hometimeouts': int(r['hometimeouts']),
+                             'awaytimeouts': int(r['awaytimeouts'])}})
+         for i, r in plays.plays.iterrows()], ordered=False)
+
+print('Stored play timeouts for %s games.' % len(gameids))
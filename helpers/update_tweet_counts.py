@@ -7,6 +7,7 @@ if not path in sys.path:
     sys.path.insert(1, path)
 del path
 
-from nflfanfare import schedule
+import nflfanfare as ff
 
-schedule.Schedule().update_db_tweet_counts()
+repaired = ff.games.reconcile_tweet_counts()
+print('Repaired tweet counts for %s games.' % len(repaired))
@@ -4,14 +4,23 @@ import logging.config
 import os
 import yaml
 
+import nflfanfare.cache as cache
 import nflfanfare.database as db
+import nflfanfare.drives as drives
+import nflfanfare.feeds as feeds
 import nflfanfare.gamecenter as gc
 import nflfanfare.games as games
+import nflfanfare.lifecycle as lifecycle
 import nflfanfare.plays as plays
+import nflfanfare.polling as polling
 import nflfanfare.secrets as sec
+import nflfanfare.sentiment as sentiment
 import nflfanfare.statistics as stats
+import nflfanfare.stream as stream
+import nflfanfare.supervisor as supervisor
 import nflfanfare.teams as teams
 import nflfanfare.twitter as twitter
+import nflfanfare.windows as windows
 
 
 def log_path():
@@ -23,4 +32,5 @@ with open(path + '/logger.yaml', 'rt') as f:
     config = yaml.safe_load(f.read())
 logging.config.dictConfig(config)
 
+# Database handle connects lazily on first use
 db = db.DB()
@@ -0,0 +1,192 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+
+import nflfanfare as ff
+from nflfanfare import secrets as sec
+
+# Seconds to cache a response by game state
+# Historic games never change and are cached indefinitely
+# Responses are keyed by the version of their data, so entries are
+# replaced when the data changes even without an invalidation
+TTLS = {
+    'historic': None,
+    'recent': 300,
+    'live': 5,
+    'starting': 5,
+    'upcoming': 60,
+    'pending': 300
+}
+
+# Seconds to cache a response when the game state is unknown
+DEFAULT_TTL = 60
+
+
+def key(endpoint, *args):
+    ''' Returns a cache key for an endpoint and its arguments
+    '''
+    return ':'.join([endpoint] + [str(_) for _ in args])
+
+
+def ttl(states):
+    ''' Returns the seconds to cache a response covering games in
+        the given states, or None to cache indefinitely
+    '''
+    ttls = [TTLS.get(_, DEFAULT_TTL) for _ in states]
+    ttls = [_ for _ in ttls if _ is not None]
+    if ttls:
+        return min(ttls)
+    return None if states else DEFAULT_TTL
+
+
+class LRU:
+    ''' In-process least recently used cache backend
+    '''
+    def __init__(self, size=512):
+
+        # Maximum number of entries
+        self.size = size
+
+        # Entries by key as (value, expires, tags)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        ''' Returns the value for a key or None if missing or expired
+        '''
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+
+            value, expires, tags = entry
+            if expires is not None and expires < datetime.utcnow():
+                return None
+
+            # Mark as most recently used
+            self.entries[key] = entry
+            return value
+
+    def set(self, key, value, ttl=None, tags=None):
+        ''' Stores a value for a key for ttl seconds
+        '''
+        expires = (datetime.utcnow() + timedelta(seconds=ttl)
+                   if ttl is not None else None)
+
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (value, expires, set(tags or []))
+
+            # Drop least recently used entries
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete_tag(self, tag):
+        ''' Deletes all entries tagged with a tag
+        '''
+        with self.lock:
+            for key in [k for k, v in self.entries.items() if tag in v[2]]:
+                del self.entries[key]
+
+
+class Mongo:
+    ''' Shared cache backend stored in the cache collection so that
+        entries and invalidations are visible to every process
+    '''
+    def get(self, key):
+        ''' Returns the value for a key or None if missing or expired
+        '''
+        entry = ff.db.cache.find_one({'_id': key})
+        if entry is None:
+            return None
+
+        if (entry['expires'] is not None and
+                entry['expires'] < datetime.utcnow()):
+            return None
+        return entry['value']
+
+    def set(self, key, value, ttl=None, tags=None):
+        ''' Stores a value for a key for ttl seconds
+        '''
+        expires = (datetime.utcnow() + timedelta(seconds=ttl)
+                   if ttl is not None else None)
+
+        ff.db.cache.replace_one({'_id': key},
+                                {'_id': key,
+                                 'value': value,
+                                 'expires': expires,
+                                 'tags': list(tags or [])},
+                                upsert=True)
+
+    def delete_tag(self, tag):
+        ''' Deletes all entries tagged with a tag
+        '''
+        ff.db.cache.delete_many({'tags': tag})
+
+
+class Cache:
+    ''' Response cache with hit and miss counters
+    '''
+    def __init__(self, backend=None):
+
+        # Storage backend
+        self.backend = backend or LRU()
+
+        # Counters shared by request threads
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        ''' Returns the cached value for a key or None
+        '''
+        value = self.backend.get(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None, tags=None):
+        ''' Caches a value for ttl seconds, or indefinitely if ttl is
+            None. Tags are used to invalidate related entries.
+        '''
+        self.backend.set(key, value, ttl, tags)
+
+    def invalidate(self, tag):
+        ''' Drops all entries tagged with a tag
+        '''
+        self.backend.delete_tag(tag)
+
+    def stats(self):
+        ''' Returns a dictionary of the hit and miss counters
+        '''
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {'backend': self.backend.__class__.__name__,
+                'hits': hits,
+                'misses': misses,
+                'ratio': float(hits) / total if total else None}
+
+
+# Shared response cache for the process
+responses = Cache(Mongo() if getattr(sec, 'cachebackend', None) == 'mongo'
+                  else LRU())
+
+
+def configure(backend):
+    ''' Replaces the backend of the shared response cache
+    '''
+    responses.backend = backend
+
+
+def invalidate_game(gameid):
+    ''' Drops cached responses that include a game.
+        Called when new plays or tweets arrive for the game. Only
+        reaches other processes with the shared mongo backend, and
+        otherwise frees entries of versions that will not be read
+        again.
+    '''
+    responses.invalidate(gameid)
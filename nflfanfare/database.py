@@ -1,24 +1,206 @@
-from pymongo import MongoClient
+from datetime import datetime
+import os
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import DuplicateKeyError
+import threading
 
 from nflfanfare import secrets as sec
 
+# Collections available as database attributes
+COLLECTIONS = ['teams', 'games', 'plays', 'pfrplays', 'tweets', 'teamtweets',
+               'cache', 'snapshots', 'drives']
+
+# Indexes required by hot path queries for each collection
+INDEXES = {
+    'tweets': [
+        {'keys': [('tweetid', ASCENDING)], 'unique': True},
+        {'keys': [('gameid', ASCENDING),
+                  ('teamid', ASCENDING),
+                  ('sentiment.sent_compound', ASCENDING)]}
+    ],
+    'games': [
+        {'keys': [('gameid', ASCENDING)]},
+        {'keys': [('eid', ASCENDING)]},
+        {'keys': [('scheduled', ASCENDING)]}
+    ],
+    'plays': [
+        {'keys': [('gameid', ASCENDING), ('playid', ASCENDING)]}
+    ],
+    'drives': [
+        {'keys': [('gameid', ASCENDING), ('drive', ASCENDING)]}
+    ],
+    'cache': [
+        {'keys': [('tags', ASCENDING)]},
+        {'keys': [('expires', ASCENDING)], 'expireAfterSeconds': 0}
+    ]
+}
+
+# Representative hot path queries checked for collection scans
+QUERIES = {
+    'tweets': [
+        {'tweetid': 0},
+        {'gameid': '', 'teamid': '', 'sentiment.sent_compound': {'$ne': 0}}
+    ],
+    'games': [
+        {'gameid': ''},
+        {'eid': ''},
+        {'scheduled': {'$gte': datetime(1970, 1, 1)}}
+    ],
+    'plays': [
+        {'gameid': ''}
+    ],
+    'drives': [
+        {'gameid': ''}
+    ]
+}
+
 
 class DB:
     ''' Database handling
+        The client is created lazily on first use and shared across
+        threads. Forked processes create their own client.
     '''
 
-    def __init__(self):
-        ''' Creates database engine
-        '''
-        self.client = MongoClient(
-            'mongodb://%s:%s@%s:27017/NFL2016' % (sec.mongouser,
-                                                  sec.mongopwd,
-                                                  sec.mongohost))
-        self.db = self.client.NFL2016
-
-        self.teams = self.db.teams
-        self.games = self.db.games
-        self.plays = self.db.plays
-        self.pfrplays = self.db.pfrplays
-        self.tweets = self.db.tweets
-        self.teamtweets = self.db.teamtweets
+    def __init__(self, pool_size=None, timeout=None, read_preference=None):
+        ''' Sets the client options without connecting.
+            Defaults are read from the secrets file.
+        '''
+        timeout = timeout or getattr(sec, 'mongotimeout', 10000)
+        self.options = {
+            'maxPoolSize': pool_size or getattr(sec, 'mongopoolsize', 50),
+            'connectTimeoutMS': timeout,
+            'serverSelectionTimeoutMS': timeout,
+            'socketTimeoutMS': getattr(sec, 'mongosockettimeout', None),
+            'readPreference': (read_preference or
+                               getattr(sec, 'mongoreadpreference',
+                                       'primary'))
+        }
+
+        # Client and the process id it was created in
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        ''' Returns the client for the current process
+        '''
+        if self._pid != os.getpid():
+            # Locks are not safe to reuse across a fork
+            if self._pid is not None:
+                self._lock = threading.Lock()
+
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = MongoClient(
+                        'mongodb://%s:%s@%s:27017/NFL2016' % (sec.mongouser,
+                                                              sec.mongopwd,
+                                                              sec.mongohost),
+                        connect=False, **self.options)
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        ''' Returns the NFL2016 database
+        '''
+        return self.client.NFL2016
+
+    def __getattr__(self, name):
+        ''' Returns collections as attributes
+        '''
+        if name in COLLECTIONS:
+            return self.db[name]
+        raise AttributeError(name)
+
+    def close(self):
+        ''' Closes the client for the current process
+        '''
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def ensure_indexes(self, collections=None):
+        ''' Creates the required indexes for the collections.
+            Existing indexes are left untouched. Unique indexes that
+            existing duplicates prevent are skipped until dedupe has
+            removed them.
+            Returns a dictionary of index names by collection.
+        '''
+        created = {}
+        for collection in (collections or INDEXES.keys()):
+            created[collection] = []
+            for index in INDEXES[collection]:
+                options = {k: v for k, v in index.items() if k != 'keys'}
+                try:
+                    name = self.db[collection].create_index(index['keys'],
+                                                            **options)
+                except DuplicateKeyError:
+                    continue
+                created[collection].append(name)
+        return created
+
+    def dedupe(self, collections=None):
+        ''' Removes documents that duplicate the keys of unique indexes
+            not yet created, keeping the first document of each key.
+            Returns a dictionary of removed counts by collection.
+        '''
+        removed = {}
+        for collection in (collections or INDEXES.keys()):
+            removed[collection] = 0
+            existing = [list(_['key']) for _ in
+                        self.db[collection].index_information().values()]
+
+            for index in INDEXES[collection]:
+                if not index.get('unique') or \
+                        list(index['keys']) in existing:
+                    continue
+
+                # Keys shared by more than one document
+                fields = [k for k, d in index['keys']]
+                group = {'_id': dict((_.replace('.', '_'), '$' + _)
+                                     for _ in fields),
+                         'first': {'$min': '$_id'},
+                         'count': {'$sum': 1}}
+                result = self.db[collection].aggregate(
+                    [{'$group': group},
+                     {'$match': {'count': {'$gt': 1}}}],
+                    allowDiskUse=True)
+
+                for r in result:
+                    search = dict((_, r['_id'][_.replace('.', '_')])
+                                  for _ in fields)
+                    search['_id'] = {'$ne': r['first']}
+                    removed[collection] += \
+                        self.db[collection].delete_many(search).deleted_count
+        return removed
+
+    def scans(self):
+        ''' Returns a list of the hot path queries that would run as
+            collection scans according to the query planner
+        '''
+        result = []
+        for collection in QUERIES:
+            for query in QUERIES[collection]:
+                plan = self.db[collection].find(query).explain()
+                # Slot based engine plans nest the stages in queryPlan
+                plan = plan['queryPlanner']['winningPlan']
+                stages = _stages(plan.get('queryPlan', plan))
+                if 'COLLSCAN' in stages:
+                    result.append({'collection': collection,
+                                   'query': query,
+                                   'stages': stages})
+        return result
+
+
+def _stages(plan):
+    ''' Returns the list of stages in an explain() query plan
+    '''
+    stages = [plan.get('stage')]
+    if 'inputStage' in plan:
+        stages += _stages(plan['inputStage'])
+    for stage in plan.get('inputStages', []):
+        stages += _stages(stage)
+    return stages
@@ -0,0 +1,46 @@
+import pandas as pd
+
+import nflfanfare as ff
+
+# Drive results that score for the team with possession
+SCORING = ['Touchdown', 'Field Goal']
+
+
+def _seconds(clock):
+    ''' Returns the seconds of a MM:SS time of possession or None
+    '''
+    try:
+        minutes, seconds = str(clock).split(':')
+        return int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+
+def summary(gameid, driveid, drive):
+    ''' Returns a drive summary document from the drive information
+        of a game feed
+    '''
+    return {'_id': '%s-%s' % (gameid, driveid),
+            'gameid': gameid,
+            'drive': driveid,
+            'posteam': drive.get('posteam'),
+            'qtr': drive.get('qtr'),
+            'plays': drive.get('numplays', len(drive.get('plays', {}))),
+            'yards': drive.get('ydsgained'),
+            'penaltyyards': drive.get('penyds'),
+            'firstdowns': drive.get('fds'),
+            'redzone': drive.get('redzone'),
+            'postime': drive.get('postime'),
+            'seconds': _seconds(drive.get('postime')),
+            'result': drive.get('result'),
+            'scoring': drive.get('result') in SCORING,
+            'start': drive.get('start'),
+            'end': drive.get('end')}
+
+
+def drives(gameid):
+    ''' Returns a data frame of the drive summaries of a game
+    '''
+    result = ff.db.drives.find({'gameid': gameid}, {'_id': 0}).\
+        sort('drive', 1)
+    return pd.DataFrame(list(result))
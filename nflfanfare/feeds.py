@@ -0,0 +1,129 @@
+from collections import OrderedDict
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from nflfanfare import secrets as sec
+
+# Base URL of the NFL feeds, overridden to poll a local fixture server
+BASE_URL = getattr(sec, 'nflbaseurl', 'http://www.nfl.com')
+
+# Pooled connections per host and request timeout in seconds
+POOL_SIZE = 32
+TIMEOUT = 10
+
+# Maximum number of feeds to remember validators and values for
+MAX_ENTRIES = 128
+
+
+def url(path):
+    ''' Returns the feed URL for a path
+    '''
+    return BASE_URL.rstrip('/') + path
+
+
+class Client:
+    ''' HTTP client for polling NFL feeds.
+        Reuses pooled keep-alive connections, asks for gzipped bodies,
+        and sends If-None-Match and If-Modified-Since validators from
+        the last response of each feed. Unchanged feeds return the last
+        parsed value without parsing the body again.
+    '''
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT):
+
+        # Logger
+        self.log = logging.getLogger('feeds.Client')
+
+        # Keep-alive session with a connection pool per host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip'
+
+        # Request timeout
+        self.timeout = timeout
+
+        # Validators, body hash and parsed value by URL
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Counters
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.parsed = 0
+
+    def get(self, url, parse):
+        ''' Returns a tuple of the parsed feed and whether it changed
+            since the last request. The parse function is only called
+            with the body of a changed feed. Returns (None, False) if
+            the request was unsuccessful.
+        '''
+        with self.lock:
+            entry = self.entries.get(url)
+
+        # Conditional request headers
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['modified']:
+                headers['If-Modified-Since'] = entry['modified']
+
+        r = self.session.get(url, headers=headers, timeout=self.timeout)
+        self.requests += 1
+
+        # Feed not modified since the last request
+        if r.status_code == 304 and entry:
+            self.not_modified += 1
+            return entry['value'], False
+
+        if r.status_code != 200:
+            self.log.warn('Could not retrieve %s: %s' % (url, r.status_code))
+            return None, False
+
+        # Feed body identical to the last request
+        digest = hashlib.md5(r.content).hexdigest()
+        if entry and entry['hash'] == digest:
+            self.unchanged += 1
+            value, changed = entry['value'], False
+        else:
+            self.parsed += 1
+            value, changed = parse(r.text), True
+
+        with self.lock:
+            self.entries.pop(url, None)
+            self.entries[url] = {'etag': r.headers.get('ETag'),
+                                 'modified': r.headers.get('Last-Modified'),
+                                 'hash': digest,
+                                 'value': value}
+
+            # Forget the least recently requested feeds
+            while len(self.entries) > MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+        return value, changed
+
+    def forget(self, url):
+        ''' Drops the validators and value of a feed so that the next
+            request downloads and parses it again
+        '''
+        with self.lock:
+            self.entries.pop(url, None)
+
+    def stats(self):
+        ''' Returns a dictionary of the request counters
+        '''
+        return {'requests': self.requests,
+                'not_modified': self.not_modified,
+                'unchanged': self.unchanged,
+                'parsed': self.parsed}
+
+
+# Shared feed client for the process
+client = Client()
@@ -1,7 +1,7 @@
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 from dateutil.parser import parse
 import inspect
+from io import BytesIO
 import json
 import logging
 import logging.config
@@ -9,14 +9,26 @@ import numpy as np
 import os
 import pandas as pd
 import pymongo
+from pymongo import UpdateOne
 import pytz
-import requests
 import subprocess
 import sys
 import time
 
+try:
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+
 import nflfanfare as ff
 
+# Last parsed (drive, playid, half, hometimeouts, awaytimeouts)
+# by gameid
+_seen = {}
+
+# Games, teams and scheduled times of the last schedule update
+_scheduled = None
+
 
 class Schedule:
     ''' Class for obtaining NFL Scoreboard game information
@@ -38,18 +50,18 @@ class Schedule:
             season, season type, and week
         '''
         # Create URL
-        url = ('http://www.nfl.com/ajax/scorestrip?'
-               'season=%s&seasonType=%s&week=%s' %
-               (season, season_type, week))
+        url = ff.feeds.url('/ajax/scorestrip?'
+                           'season=%s&seasonType=%s&week=%s' %
+                           (season, season_type, week))
 
         # Wait a random lognormal amount of seconds
         time.sleep(np.random.lognormal(1, .5, 1)[0])
 
         # Return XML if response was successful
-        r = requests.get(url)
-        if r.status_code == 200:
-            if len(r.text) > 50:
-                return self._parse_games(r.text)
+        df, changed = ff.feeds.client.get(url, self._load_games)
+        if df is not None:
+            if not df.empty:
+                return df.copy()
 
             # Response does not contain data
             print ('No data contained in XML for %s %s week %s.' %
@@ -61,6 +73,14 @@ class Schedule:
                (season_type, season, week))
         return pd.DataFrame()
 
+    def _load_games(self, xml):
+        ''' Returns a data frame from XML data or an empty data frame
+            if the XML does not contain data
+        '''
+        if len(xml) > 50:
+            return self._parse_games(xml)
+        return pd.DataFrame()
+
     def _parse_games(self, xml):
         ''' Returns a data frame from XML data
         '''
@@ -83,33 +103,30 @@ class Schedule:
             '_id': '_id'
         }
 
-        # Parse XML
-        soup = BeautifulSoup(xml, 'html.parser')
-
-        # Week information
-        week = soup.find_all('gms')[0].attrs
+        # Parse week and game attributes from the XML in one pass
+        week, games = {}, []
+        for event, elem in etree.iterparse(BytesIO(xml.encode('utf-8'))):
+            if elem.tag == 'g':
+                games.append(dict(elem.attrib))
+            elif elem.tag == 'gms':
+                week = dict(elem.attrib)
+            elem.clear()
 
         # Convert games to dataframe
-        games = soup.find_all('g')
-        df = pd.DataFrame([_.attrs for _ in games])
+        df = pd.DataFrame(games)
 
         # Create _id column for MongoDB
         df['_id'] = df.gsis
 
         # Create date from EID and time accounting for London games
-        gdate = df.eid.apply(lambda x: x[:-2])
-        gtime = df.t.apply(lambda x:
-                           x + ' AM' if x == '9:30' else x + ' PM')
+        gdate = df.eid.str[:-2]
+        gtime = df.t + np.where(df.t == '9:30', ' AM', ' PM')
 
         # Convert scheduled time to datetime and localize to UTC
-        df['scheduled'] = gdate + ' ' + gtime
-        df['scheduled'] = pd.to_datetime(df.scheduled)
-        df['scheduled'] = df.scheduled.apply(
-                              lambda x:
-                              pytz.timezone('US/Eastern').localize(x))
-        df['scheduled'] = df.scheduled.apply(
-                                lambda x:
-                                x.astimezone(pytz.timezone('UTC')))
+        df['scheduled'] = pd.to_datetime(gdate + ' ' + gtime,
+                                         format='%Y%m%d %I:%M %p')
+        df['scheduled'] = df.scheduled.dt.tz_localize('US/Eastern').\
+            dt.tz_convert('UTC')
 
         # Add week information
         df['week'] = week['w']
@@ -152,23 +169,26 @@ class Schedule:
 
         return df
 
-    def _get_update(self):
-        ''' Returns a dataframe of the updated season schdule
+    def _get_update(self, jitter=True):
+        ''' Returns a tuple of the updated season schedule data frame
+            and whether it changed since the last update
+            Waits a random time first unless jitter is false.
         '''
         # Create URL
-        url = 'http://www.nfl.com/liveupdate/scorestrip/ss.xml'
+        url = ff.feeds.url('/liveupdate/scorestrip/ss.xml')
 
         # Wait a random lognormal amount of seconds
-        time.sleep(np.random.lognormal(2, .5, 1)[0])
+        if jitter:
+            time.sleep(np.random.lognormal(2, .5, 1)[0])
 
         try:
             # Return XML if response was successful
-            r = requests.get(url)
-            if r.status_code == 200:
-                if len(r.text) > 50:
-                    return self._parse_games(r.text)
+            df, changed = ff.feeds.client.get(url, self._load_games)
+            if df is not None:
+                return df.copy(), changed
         except:
-            return pd.DataFrame()
+            pass
+        return pd.DataFrame(), False
 
     def _add_schedule(self, season):
         ''' Adds scheduled games to database
@@ -192,13 +212,19 @@ class Schedule:
                 except:
                     pass
 
-    def _update(self):
+        # Rebuild game lookups with the new schedule
+        ff.games.invalidate()
+        ff.windows.invalidate()
+
+    def _update(self, jitter=True):
         ''' Adds game updates to database and returns updated
             schedule dataframe
         '''
+        global _scheduled
         # Converts schedule data frame to dictionary
-        df = self._get_update()
-        if not df.empty:
+        # Unchanged schedules are already in the database
+        df, changed = self._get_update(jitter)
+        if changed and not df.empty:
             data = df.to_dict(orient='records')
 
             # Log schedule update
@@ -212,6 +238,14 @@ class Schedule:
                 except:
                     pass
 
+            # Rebuild game windows when the scheduled games change,
+            # not on every score change
+            scheduled = set(zip(df.gameid, df.hometeam, df.awayteam,
+                                df.scheduled.astype(str)))
+            if scheduled != _scheduled:
+                _scheduled = scheduled
+                ff.windows.invalidate()
+
         return df
 
     def _last_game(self, season):
@@ -239,12 +273,17 @@ class Game:
         self.info = self._game_info(self.gameid)
 
         # JSON url for game
-        self.url = ('http://www.nfl.com/liveupdate/game-center/'
-                    '%s/%s_gtd.json' % (self.info['eid'], self.info['eid']))
+        self.url = ff.feeds.url('/liveupdate/game-center/%s/%s_gtd.json' %
+                                (self.info['eid'], self.info['eid']))
 
         # Game status
         self.status = self._status()
 
+        # Quarter, clock and drive summaries from the last parsed feed
+        self.qtr = None
+        self.clock = None
+        self.drives = []
+
     def _game_info(self, gameid):
         ''' Returns a dictionary of the game info
         '''
@@ -257,79 +296,161 @@ class Game:
         return None
 
     def _get_feed(self):
-        ''' Retreives JSON data for a game
+        ''' Retreives JSON data for a game.
+            Returns None if the feed has not changed since the last
+            request.
         '''
-        # Return XML if response was successful
+        # Return JSON if response was successful and changed
         try:
-            r = requests.get(self.url)
-            if r.status_code == 200:
-                if len(r.text) > 50:
-                    return json.loads(r.text)[self.info['eid']]
+            feed, changed = ff.feeds.client.get(self.url, self._load_feed)
+            if changed:
+                return feed
         except:
             return None
 
+    def _load_feed(self, text):
+        ''' Returns the game data from the JSON feed text
+        '''
+        if len(text) > 50:
+            return json.loads(text)[self.info['eid']]
+        return None
+
     def _parse_feed(self):
-        ''' Parses the JSON feed plays and returns a data frame
+        ''' Parses the JSON feed and returns a list of the plays added
+            since the last parse of the game
         '''
         feed = self._get_feed()
 
-        # Empty dataframe for plays
-        df = pd.DataFrame()
+        # Plays after the last parsed drive and play, and summaries
+        # of the drives they belong to
+        records = []
+        self.drives = []
+        last = _seen.get(self.gameid)
+        lastdrive, lastplay = last[:2] if last else (0, 0)
 
         # Check if feed contains data
         if feed:
 
+            # Current quarter and clock
+            self.qtr = feed.get('qtr')
+            self.clock = feed.get('clock')
+
+            # Current score and collection time
+            homescore = int(feed['home']['score']['T'])
+            awayscore = int(feed['away']['score']['T'])
+            collected = datetime.utcnow()
+
             # Convert drive keys to interger and sort
             drives = feed['drives']
             driveid = sorted([int(_) for _ in drives if not _ == 'crntdrv'])
 
-            # Iterate through drives
+            # Iterate through drives not yet completed
             for d in driveid:
+                if d < lastdrive:
+                    continue
 
-                # Iterate through plays
+                # Iterate through new plays
                 plays = drives[str(d)]['plays']
-                for p in plays:
+                for p in sorted(plays, key=int):
+                    if int(p) <= lastplay:
+                        continue
 
                     # Add additional play information
-                    plays[p]['gameid'] = self.info['gameid']
-                    plays[p]['_id'] = self.info['gameid'] + '-' + p
-                    plays[p]['playid'] = int(p)
-                    plays[p]['collected_time'] = datetime.utcnow()
-                    plays[p]['homescore'] = int(feed['home']['score']['T'])
-                    plays[p]['awayscore'] = int(feed['away']['score']['T'])
-                    plays[p]['drive'] = d
-
-                    df = df.append(pd.Series(plays[p]), ignore_index=True)
-
-        return df
+                    play = dict(plays[p])
+                    play['gameid'] = self.info['gameid']
+                    play['_id'] = self.info['gameid'] + '-' + p
+                    play['playid'] = int(p)
+                    play['collected_time'] = collected
+                    play['homescore'] = homescore
+                    play['awayscore'] = awayscore
+                    play['drive'] = d
+
+                    records.append(play)
+
+            if records:
+                # Remaining timeouts carried from the last parsed play
+                home, away = ff.plays.timeouts(pd.DataFrame(records),
+                                               self.info['hometeam'],
+                                               self.info['awayteam'],
+                                               last[2:] if last else None)
+                for play, h, a in zip(records, home, away):
+                    play['hometimeouts'] = int(h)
+                    play['awaytimeouts'] = int(a)
+
+                # Remember the last parsed play
+                play = records[-1]
+                _seen[self.gameid] = (play['drive'], play['playid'],
+                                      int(ff.plays.halves([play['qtr']])[0]),
+                                      play['hometimeouts'],
+                                      play['awaytimeouts'])
+
+            # Summaries of the drives with new plays and of the
+            # previous drive, whose result can change without new
+            # plays when it ends
+            touched = set(_['drive'] for _ in records)
+            if str(lastdrive) in drives:
+                touched.add(lastdrive)
+            for d in sorted(touched):
+                self.drives.append(ff.drives.summary(
+                    self.info['gameid'], d, drives[str(d)]))
+
+        return records
 
     def _update(self):
-        ''' Updates the play information for a game
+        ''' Updates the play information for a game and returns the
+            list of plays added to the database
         '''
         plays = self._parse_feed()
 
-        # Check to see if any plays
-        if not plays.empty:
-            plays = plays.to_dict(orient='records')
+        # Update the summaries of the drives in the feed
+        if self.drives:
+            try:
+                ff.db.drives.bulk_write(
+                    [UpdateOne({'_id': drive['_id']},
+                               {'$set': drive},
+                               upsert=True) for drive in self.drives],
+                    ordered=False)
+            except:
+                self.log.error('Could not update drives for game %s: %s' %
+                               (self.gameid, sys.exc_info()[1]))
 
-            # Iterate through plays
-            for play in plays:
+        # Check to see if any plays
+        if not plays:
+            return []
 
-                # Check to see if play is in the database
-                result = ff.db.plays.find_one({'_id': play['_id']})
-                if not result:
-                    try:
-                        ff.db.plays.insert_one(play)
-
-                        self.log.info('Adding play %s to the database '
-                                      'for game %s. [%s: %s | %s: %s].' %
-                                      (play['playid'], play['gameid'],
-                                       self.info['hometeam'],
-                                       play['homescore'],
-                                       self.info['awayteam'],
-                                       play['awayscore']))
-                    except:
-                        pass
+        # Insert plays not already in the database in one request
+        try:
+            result = ff.db.plays.bulk_write(
+                [UpdateOne({'_id': play['_id']},
+                           {'$setOnInsert': play},
+                           upsert=True) for play in plays],
+                ordered=False)
+        except:
+            # Parse the whole feed again on the next update
+            _seen.pop(self.gameid, None)
+            ff.feeds.client.forget(self.url)
+            self.log.error('Could not add plays for game %s: %s' %
+                           (self.gameid, sys.exc_info()[1]))
+            return []
+
+        added = [plays[i] for i in sorted(result.upserted_ids)]
+        for play in added:
+            self.log.info('Adding play %s to the database '
+                          'for game %s. [%s: %s | %s: %s].' %
+                          (play['playid'], play['gameid'],
+                           self.info['hometeam'],
+                           play['homescore'],
+                           self.info['awayteam'],
+                           play['awayscore']))
+
+        # Mark the game as updated and drop cached responses
+        if added:
+            ff.db.games.update_one({'_id': self.gameid},
+                                   {'$set': {'updated':
+                                             datetime.utcnow()}})
+            ff.cache.invalidate_game(self.gameid)
+
+        return added
 
     def _pre_post_times(self, starttime):
         ''' Returns timedelta of pregame and postgame times
@@ -374,25 +495,63 @@ class Game:
 class Collector:
     ''' Class for updating Game Center information in the database
     '''
-    def __init__(self):
+    def __init__(self, update=True):
 
         # Logger
         self.log = logging.getLogger('gamecenter.Collector')
 
         # Get schedule update
-        self.schedule = ff.gc.Schedule()._update()
+        self.schedule = ff.gc.Schedule()._update() if update else None
+
+        # Scores and status by gameid from the last scorestrip poll
+        self.scores = None
+
+    def _states(self, df):
+        ''' Returns a series of game states from the scheduled times
+            of a schedule data frame
+        '''
+        scheduled = pd.to_datetime(df.scheduled, utc=True).dt.tz_convert(None)
+        return ff.games.states(scheduled)
 
     def _pending(self):
         ''' Returns a data frame of pending games
         '''
-        if not self.schedule.empty:
+        df = pd.DataFrame()
+        if self.schedule is not None and not self.schedule.empty:
             df = self.schedule[self.schedule.status != 'F'].copy()
 
-            # Determine game status
-            df['status'] = df.gameid.apply(lambda x: Game(x).status)
+            # Determine game status from the scheduled times
+            df['status'] = self._states(df)
 
         return df
 
+    def _poll(self):
+        ''' Reads the scorestrip once and returns a data frame of the
+            games whose score or status changed since the last poll,
+            with their game states
+            Polls without the random wait, which would delay the
+            callers' loops on every poll.
+        '''
+        df = ff.gc.Schedule()._update(jitter=False)
+        self.schedule = df
+        if df.empty:
+            return df
+
+        # Compare scores and status with the last poll
+        scores = df.set_index('gameid')[['homescore', 'awayscore', 'status']]
+        scores = scores.fillna('').astype(str)
+        if self.scores is None:
+            changed = scores.index
+        else:
+            previous = self.scores.reindex(scores.index)
+            changed = scores.index[(scores != previous).any(axis=1)]
+        self.scores = scores
+
+        df = df[df.gameid.isin(changed)].copy()
+        df['state'] = self._states(df)
+
+        return df.reset_index(drop=True)
+
     def _spawn(self):
         ''' Spawns the monitoring process for all upcoming games
         '''
@@ -400,14 +559,18 @@ class Collector:
         df = self._pending()
 
         if not df.empty:
+            # Games already updating
+            updating = set(_['gameid'] for _ in ff.db.games.find(
+                {'gameid': {'$in': list(df.gameid)}, 'updating': True},
+                {'gameid': 1}))
+
             # Iterate through games
             for i, r in df.iterrows():
 
                 if r['status'] == 'live' or r['status'] == 'starting':
-                    info = ff.gc.Game(r['gameid']).info
 
                     # Check if game is not already updating
-                    if 'updating' not in info.keys():
+                    if r['gameid'] not in updating:
                         subprocess.Popen(['python',
                                           (ff.sec.helper_path +
                                            'monitor_game.py'),
@@ -419,9 +582,12 @@ class Collector:
                                          close_fds=True)
             sys.exit(1)
 
-    def _monitor(self, gameid):
+    def _monitor(self, gameid, stop=None):
         ''' Monitors a game JSON feed to update plays
+            Polls adaptively to the game situation and stops early
+            when the optional stop event is set.
         '''
+        poller = None
         try:
             game = ff.gc.Game(gameid)
 
@@ -444,18 +610,28 @@ class Collector:
                 end = game.info['scheduled'] + timedelta(hours=4)
 
                 # Monitor until end of game
+                poller = ff.polling.Poller(gameid, 'plays')
                 while now < end:
-                    # Wait a random lognormal amount of seconds
-                    time.sleep(np.random.lognormal(2, .5, 1)[0])
+                    # Wait for the next poll
+                    if poller.wait(stop):
+                        self.log.info('Monitoring game %s was cancelled.' %
+                                      gameid)
+                        break
 
                     # Update game plays and current time
                     now = datetime.utcnow()
 
                     # Try to update game plays
                     try:
-                        game._update()
+                        added = game._update()
                     except:
-                        pass
+                        added = []
+
+                    # Adapt the poll interval to the new plays
+                    poller.record(len(added), game.qtr, game.clock,
+                                  timeout=any('Timeout #' in
+                                              str(_.get('desc'))
+                                              for _ in added))
 
                     # Stop monitoring if game status is final
                     game = ff.gc.Game(gameid)
@@ -463,6 +639,12 @@ class Collector:
                             game.info['status'] == 'FO'):
                         self.log.info('Game %s has ended.' % gameid)
 
+                        # Collect the final plays and drive result
+                        try:
+                            game._update()
+                        except:
+                            pass
+
                         # Set end time of game
                         now = datetime.utcnow()
                         ended = pytz.timezone('UTC').localize(now)
@@ -483,6 +665,14 @@ class Collector:
                             sys.exc_info()[1]))
 
         finally:
+            # Report poll efficiency
+            if poller:
+                usage = poller.efficiency()
+                self.log.info('Polled game %s %s times, %s with new '
+                              'plays.' % (gameid, usage['polls'],
+                                          usage['useful']))
+                poller.close()
+
             # Mark game as finished
             ff.db.games.update_one({'_id': gameid},
                                    {'$unset': {'updating': ''}})
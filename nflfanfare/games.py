@@ -1,64 +1,196 @@
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+import threading
 
 import nflfanfare as ff
 
+# Shared gameid and EID lookup for the process
+_registry = None
+_lock = threading.Lock()
+
+
+# Game states in order of scheduled time
+STATES = ['historic', 'recent', 'live', 'starting', 'upcoming', 'pending']
+
 
 def games(state=None):
-    ''' Returns a dataframe of game ids in the database
+    ''' Returns a dataframe of game ids in the database.
+        Only games scheduled within the times of the requested
+        states are fetched when the state argument is set.
     '''
+    now = datetime.utcnow()
+
+    # Convert to list if state is string
+    if type(state) is str:
+        state = [state]
+
+    # Scheduled time ranges for the requested states
+    search = {}
+    if state:
+        search = {'$or': [{'scheduled': _range(_, now)} for _ in state]}
+
     # Find games
-    result = ff.db.games.find({},
-                              {'gameid': 1, 'eid': '1',
+    result = ff.db.games.find(search,
+                              {'gameid': 1, 'eid': 1,
                                'scheduled': 1, '_id': 0})
 
-    # Add game state
     df = pd.DataFrame(list(result))
-    df['state'] = df.scheduled.apply(lambda x: _state(x))
+    if df.empty:
+        return pd.DataFrame(columns=['gameid', 'eid', 'scheduled', 'state'])
+
+    # Add game state
+    df['state'] = states(df.scheduled, now)
 
     # Subset if state argument is set
     if state:
-        # Convert to list if state is string
-        if type(state) is str:
-            state = [state]
         return df[df.state.isin(state)].reset_index(drop=True)
     return df
 
 
+def _bounds(now):
+    ''' Returns the scheduled times that separate game states
+    '''
+    return {'oneweek': now - timedelta(days=7),
+            'ended': now - timedelta(hours=4),
+            'starting': now + timedelta(minutes=15),
+            'upcoming': now + timedelta(hours=1)}
+
+
+def _range(state, now):
+    ''' Returns a MongoDB condition on the scheduled time of games
+        in a state
+    '''
+    b = _bounds(now)
+    return {
+        'historic': {'$lt': b['oneweek']},
+        'recent': {'$gt': b['oneweek'], '$lt': b['ended']},
+        'live': {'$gt': b['ended'], '$lt': now},
+        'starting': {'$gt': now, '$lt': b['starting']},
+        'upcoming': {'$gte': b['starting'], '$lt': b['upcoming']},
+        'pending': {'$gte': b['upcoming']}
+    }[state]
+
+
+def states(scheduled, now=None):
+    ''' Returns an array of game states for an array of scheduled
+        times, all classified against the same current time
+    '''
+    now = now or datetime.utcnow()
+    b = dict((k, np.datetime64(v)) for k, v in _bounds(now).items())
+    now = np.datetime64(now)
+    start = pd.to_datetime(pd.Series(scheduled)).values
+
+    conditions = [start < b['oneweek'],
+                  (start > b['oneweek']) & (start < b['ended']),
+                  (start > b['ended']) & (start < now),
+                  (start > now) & (start < b['starting']),
+                  (start >= b['starting']) & (start < b['upcoming']),
+                  start >= b['upcoming']]
+
+    return np.select(conditions, np.array(STATES, dtype=object),
+                     default=None)
+
+
+def registry():
+    ''' Returns the shared game lookup dictionary.
+        Maps gameids and EIDs to gameids. Loaded from the database
+        on first use.
+    '''
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = _build_registry()
+    return _registry
+
+
+def invalidate():
+    ''' Drops the shared game lookup so that it is reloaded
+        from the database on next use
+    '''
+    global _registry
+    with _lock:
+        _registry = None
+
+
+def _build_registry():
+    ''' Builds the game lookup dictionary from the database.
+        EIDs take priority over gameids when identifiers collide.
+    '''
+    records = list(ff.db.games.find({}, {'gameid': 1, 'eid': 1, '_id': 0}))
+
+    lookup = {}
+    for column in ['gameid', 'eid']:
+        for record in records:
+            if record.get(column) and record.get('gameid'):
+                lookup[record[column]] = record['gameid']
+
+    return lookup
+
+
 def _state(start):
     ''' Returns game state
     '''
-    pre = start - timedelta(hours=1)
-    post = start + timedelta(hours=4)
-    now = datetime.utcnow()
-    oneweek = now - timedelta(days=7)
-    upcoming = now + timedelta(hours=1)
-    starting = now + timedelta(minutes=15)
-
-    # Historic game (> 1 week)
-    if start < oneweek:
-        return "historic"
-    # Recent game (< 1 week)
-    elif start > oneweek and post < now:
-        return "recent"
-    # Live game (on now)
-    elif start < now and post > now:
-        return "live"
-    # Game starting (within 15 minutes)
-    elif start > now and start < starting:
-        return "starting"
-    # Upcoming game (within 1 hour)
-    elif start > now and start < upcoming:
-        return "upcoming"
-    # Pending game (> 1 hour away)
-    elif start > datetime.now():
-        return "pending"
-
-    return None
+    return states([start])[0]
+
+
+def reconcile_tweet_counts(gameid=None):
+    ''' Recounts the tweets of games and repairs stored tweet counts
+        that have drifted from the tweets collection. Reconciles all
+        games unless a gameid is given. Skips games whose tweets are
+        being collected, since their counts change during the recount.
+        Returns a list of the gameids that were repaired.
+    '''
+    match = {'gameid': gameid} if gameid else {'gameid': {'$ne': None}}
+
+    # Count all tweets and tweets with sentiment by game and team
+    result = ff.db.tweets.aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': {'gameid': '$gameid', 'teamid': '$teamid'},
+            'tweets': {'$sum': 1},
+            'sentiment': {'$sum': {'$cond': [
+                {'$ne': ['$sentiment.sent_compound', 0]}, 1, 0]}}
+        }}
+    ])
+
+    counts = {}
+    for r in result:
+        counts.setdefault(r['_id']['gameid'], {})[r['_id'].get('teamid')] = r
+
+    # Compare with the stored counts
+    repaired = []
+    search = {'gameid': gameid} if gameid else {}
+    search['twitter'] = {'$exists': False}
+    for game in ff.db.games.find(search, {'gameid': 1, 'hometeam': 1,
+                                          'awayteam': 1, 'tweetcounts': 1,
+                                          'sentcounts': 1}):
+        teams = counts.get(game['gameid'], {})
+        stored = {}
+        for field, column in [('tweetcounts', 'tweets'),
+                              ('sentcounts', 'sentiment')]:
+            home = teams.get(game['hometeam'], {}).get(column, 0)
+            away = teams.get(game['awayteam'], {}).get(column, 0)
+            stored[field] = {'hometeam': home,
+                             'awayteam': away,
+                             'total': home + away}
+
+        if (game.get('tweetcounts') != stored['tweetcounts'] or
+                game.get('sentcounts') != stored['sentcounts']):
+            # Leave games that started collecting since the recount
+            result = ff.db.games.update_one({'_id': game['_id'],
+                                             'twitter': {'$exists': False}},
+                                            {'$set': stored})
+            if result.matched_count:
+                repaired.append(game['gameid'])
+
+    return repaired
 
 
 class Game:
-    ''' Class for handling game information
+    ''' Class for handling game information.
+        Tweet counts and team colors are looked up on first use.
     '''
     def __init__(self, match):
 
@@ -81,61 +213,51 @@ class Game:
             # Game state
             self.state = _state(self.scheduled)
 
-            # Tweet counts
-            self.hometweets, self.awaytweets = self._tweet_count()
-
-            # Home and away team colors
-            self.colors = self._colors()
-
             # Update game info
             self.info = vars(self)
 
+    def __getattr__(self, name):
+        ''' Looks up the tweet counts and team colors on first use
+        '''
+        if name in ['hometweets', 'awaytweets']:
+            self.hometweets, self.awaytweets = self._tweet_count()
+        elif name == 'colors':
+            self.colors = self._colors()
+        else:
+            raise AttributeError(name)
+        return getattr(self, name)
+
     def _info(self):
         ''' Returns a game info dictionary from the database.
             Allows for matching by gameid or EID.
         '''
-        df = games()
-
-        query = None
-        if self.match in list(df.gameid):
-            query = 'gameid'
-        if self.match in list(df.eid):
-            query = 'eid'
-
-        if query:
-            result = ff.db.games.find_one({query: self.match})
-            return result
-        return None
+        gameid = registry().get(self.match)
+        if gameid:
+            return ff.db.games.find_one({'gameid': gameid})
+
+        # Games added since the lookup was loaded
+        result = ff.db.games.find_one({'$or': [{'eid': self.match},
+                                               {'gameid': self.match}]})
+        if result:
+            registry()[self.match] = result['gameid']
+        return result
+
+    def details(self):
+        ''' Returns a copy of the game info dictionary including
+            the tweet counts and team colors
+        '''
+        details = dict(self.info)
+        details.pop('info', None)
+        for name in ['hometweets', 'awaytweets', 'colors']:
+            details[name] = getattr(self, name)
+        return details
 
     def _tweet_count(self):
         ''' Returns the number of tweets in the database for
-            each team.
+            each team from the stored tweet counts.
         '''
-        # Aggregate database search for gameid and count
-        # the tweets grouped by teamid
-        tweets = ff.db.tweets.aggregate([
-                {'$match':
-                    {'gameid': self.gameid}},
-                {'$group':
-                    {'_id': '$teamid',
-                     'count': {'$sum': 1}}}])
-
-        tweets = list(tweets)
-        hometweets, awaytweets = 0, 0
-
-        # Check to see if game has tweets and update count
-        if tweets:
-            df = pd.DataFrame(tweets)
-
-            home = df[df._id == self.hometeam]
-            if not home.empty:
-                hometweets = int(home['count'])
-
-            away = df[df._id == self.awayteam]
-            if not away.empty:
-                awaytweets = int(away['count'])
-
-        return hometweets, awaytweets
+        counts = self.info.get('tweetcounts') or {}
+        return counts.get('hometeam', 0), counts.get('awayteam', 0)
 
     def _colors(self):
         ''' Determines the primary and secondary colors for the
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+import hashlib
+import heapq
+import logging
+import sys
+import threading
+import time
+
+import nflfanfare as ff
+
+# Offsets from the scheduled time at which games enter each state
+TRANSITIONS = [
+    ('upcoming', timedelta(hours=-1)),
+    ('starting', timedelta(minutes=-15)),
+    ('live', timedelta(0)),
+    ('recent', timedelta(hours=4)),
+    ('historic', timedelta(days=7))
+]
+
+# Seconds between checks of the schedule for changes
+REFRESH = 900
+
+
+class Scheduler:
+    ''' Heap of upcoming game state transitions built from the
+        scheduled times in the games collection. Passes each game and
+        its new state to the dispatch function when the state changes.
+        The heap is rebuilt only when the schedule changes.
+    '''
+    def __init__(self, dispatch, refresh=REFRESH):
+
+        # Function called with the gameid and state of transitions
+        self.dispatch = dispatch
+
+        # Seconds between schedule checks
+        self.refresh = refresh
+
+        # Transitions as (time, gameid, state) and schedule signature
+        self.heap = []
+        self.signature = None
+        self.checked = None
+
+        # Logger
+        self.log = logging.getLogger('lifecycle.Scheduler')
+
+    def _schedule(self, now):
+        ''' Returns a list of (gameid, scheduled) for games with
+            transitions after now
+        '''
+        result = ff.db.games.find(
+            {'scheduled': {'$gt': now - TRANSITIONS[-1][1]}},
+            {'gameid': 1, 'scheduled': 1, '_id': 0}).sort('gameid', 1)
+        return [(_['gameid'], _['scheduled']) for _ in result
+                if _.get('gameid')]
+
+    def _build(self, games, now):
+        ''' Builds the transition heap and dispatches the current
+            state of each game
+        '''
+        heap = []
+        for gameid, scheduled in games:
+            for state, offset in TRANSITIONS:
+                if scheduled + offset > now:
+                    heap.append((scheduled + offset, gameid, state))
+        heapq.heapify(heap)
+        self.heap = heap
+
+        self.log.info('Scheduled %s transitions for %s games.' %
+                      (len(heap), len(games)))
+
+        # Games already past their first transition
+        states = ff.games.states([_[1] for _ in games], now)
+        for (gameid, scheduled), state in zip(games, states):
+            if state not in [None, 'pending', 'historic']:
+                self.dispatch(gameid, state)
+
+    def check(self, now=None):
+        ''' Rebuilds the heap if the schedule changed since the last
+            check
+        '''
+        now = now or datetime.utcnow()
+        self.checked = time.time()
+
+        games = self._schedule(now)
+        signature = hashlib.md5(repr(games).encode('utf-8')).hexdigest()
+        if signature != self.signature:
+            self.signature = signature
+            self._build(games, now)
+
+    def step(self, now=None):
+        ''' Checks the schedule when due and dispatches the transitions
+            that have passed
+        '''
+        if self.checked is None or time.time() - self.checked >= \
+                self.refresh:
+            self.check(now)
+
+        now = now or datetime.utcnow()
+        while self.heap and self.heap[0][0] <= now:
+            when, gameid, state = heapq.heappop(self.heap)
+            self.log.info('Game %s is %s.' % (gameid, state))
+            self.dispatch(gameid, state)
+
+    def seconds(self, now=None):
+        ''' Returns the seconds until the next transition or schedule
+            check
+        '''
+        seconds = self.refresh
+        if self.checked is not None:
+            seconds -= time.time() - self.checked
+        if self.heap:
+            now = now or datetime.utcnow()
+            seconds = min(seconds,
+                          (self.heap[0][0] - now).total_seconds())
+        return max(seconds, 0)
+
+    def run(self, stop=None):
+        ''' Dispatches transitions as they happen until the optional
+            stop event is set
+        '''
+        stop = stop or threading.Event()
+
+        self.log.info('Lifecycle scheduler started.')
+        while not stop.is_set():
+            try:
+                self.step()
+            except:
+                self.log.error('Unknown error: %s' % sys.exc_info()[1])
+
+            stop.wait(self.seconds())
+        self.log.info('Lifecycle scheduler stopped.')
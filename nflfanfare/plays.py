@@ -1,8 +1,48 @@
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 
 import nflfanfare as ff
 
+# Other team ids used in play descriptions
+ALIASES = {'JAX': ['JAC']}
+
+
+def halves(qtr):
+    ''' Returns an array of the half of each quarter.
+        Overtime is counted as a third half.
+    '''
+    qtr = np.asarray(qtr)
+    return np.select([qtr <= 2, qtr < 5], [1, 2], 3)
+
+
+def timeouts(df, hometeam, awayteam, last=None):
+    ''' Returns arrays of the home and away timeouts remaining after
+        each play of a data frame of plays sorted by playid. The last
+        argument is the (half, hometimeouts, awaytimeouts) after the
+        play before the first play, if any.
+    '''
+    half = pd.Series(halves(df.qtr), index=df.index)
+
+    # Timeout number of timeout plays
+    desc = df.desc.fillna('').astype(str)
+    number = desc.str.extract(r'Timeout #([123])', expand=False).astype(float)
+
+    result = []
+    for i, team in enumerate([hometeam, awayteam]):
+        pattern = '|'.join([team] + ALIASES.get(team, []))
+        called = number.notnull() & desc.str.contains(pattern)
+
+        # Carry the timeouts left forward within each half
+        left = (3 - number).where(called).groupby(half).ffill()
+        if last is not None:
+            carry = half == last[0]
+            left[carry] = left[carry].fillna(last[i + 1])
+
+        result.append(left.fillna(3).astype(int).values)
+
+    return result[0], result[1]
+
 
 class Plays:
     ''' Plays class
@@ -17,12 +57,15 @@ class Plays:
 
             # Game plays
             self.plays = self._plays()
-            self.plays = self._timeouts()
+
+            # Timeouts are stored on plays when they are collected
+            if self.plays is not None and not self._stored():
+                self.plays = self._timeouts()
 
     def _plays(self):
         ''' Returns a data frame of plays for a game
         '''
-        result = ff.db.plays.find({'gameid': self.gameid})
+        result = ff.db.plays.find({'gameid': self.gameid}).sort('playid', 1)
         if result:
             df = pd.DataFrame(list(result))
 
@@ -33,48 +76,20 @@ class Plays:
                 for fcol in fixcols:
                     df[fcol] = df[fcol].str.replace('JAC', 'JAX')
 
-            # Set timeouts to 3
-            df['awaytimeouts'] = 3
-            df['hometimeouts'] = 3
-
             return df
         return None
 
+    def _stored(self):
+        ''' Returns true if every play has stored timeouts
+        '''
+        columns = ['hometimeouts', 'awaytimeouts']
+        return (all(_ in self.plays for _ in columns) and
+                bool(self.plays[columns].notnull().all().all()))
+
     def _timeouts(self):
         ''' Calculates the number of time outs for each team
         '''
         df = self.plays
-
-        # Remaining time out lookup
-        lookup = {'#1': 2, '#2': 1, '#3': 0}
-
-        halfs = [df.loc[df.qtr <= 2],
-                 df.loc[(df.qtr > 2) & (df.qtr < 5)],
-                 df.loc[df.qtr >= 5]]
-
-        # Empty plays dataframe
-        df = pd.DataFrame()
-
-        for half in halfs:
-
-            # Half timeouts
-            tos = half.desc[half.desc.str.contains('Timeout #')]
-
-            # Iterate through timeouts
-            for i, to in tos.iteritems():
-
-                # Timeouts left
-                toleft = lookup[to.split(' ')[1]]
-
-                # Deduct home or away timeouts
-                if self.game.hometeam in to:
-                    half.loc[half.index >= i,
-                             'hometimeouts'] = toleft
-                if self.game.awayteam in to:
-                    half.loc[half.index >= i,
-                             'awaytimeouts'] = toleft
-
-            # Append half to game plays
-            df = df.append(half)
-
+        df['hometimeouts'], df['awaytimeouts'] = timeouts(
+            df, self.game.hometeam, self.game.awayteam)
         return df
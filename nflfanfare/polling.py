@@ -0,0 +1,245 @@
+import threading
+import time
+
+from nflfanfare import secrets as sec
+
+# Requests per second and burst size of the process-wide budget
+# for each kind of poll
+BUDGETS = {
+    'plays': (getattr(sec, 'playsrate', 2.), 10),
+    'tweets': (getattr(sec, 'tweetsrate', .4), 10)
+}
+
+# Minimum, default and maximum seconds between polls
+INTERVALS = {
+    'plays': (3, 10, 60),
+    'tweets': (3, 10, 60)
+}
+
+# Changes to aim for in each poll
+TARGET = 1.
+
+# Weight of the latest poll in the change rate average
+ALPHA = .3
+
+# Seconds between polls during halftime and after a timeout
+HALFTIME = 120
+TIMEOUT = 30
+
+# Seconds left in a half when the two-minute drill starts
+TWO_MINUTE = 120
+
+# Budgets and pollers for the process
+_budgets = {}
+_pollers = {}
+_lock = threading.Lock()
+
+
+def _seconds(clock):
+    ''' Returns the seconds left on a MM:SS game clock or None
+    '''
+    try:
+        minutes, seconds = str(clock).split(':')
+        return int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+
+def budget(kind):
+    ''' Returns the shared request budget for a kind of poll
+    '''
+    with _lock:
+        if kind not in _budgets:
+            _budgets[kind] = Budget(*BUDGETS[kind])
+        return _budgets[kind]
+
+
+def wake(kind, gameid):
+    ''' Ends the current wait of the poller for a game so that it
+        polls now. Returns false if the game has no poller.
+    '''
+    with _lock:
+        poller = _pollers.get((kind, gameid))
+    if poller:
+        poller.wake()
+    return poller is not None
+
+
+def report():
+    ''' Returns a list of efficiency dictionaries for the active
+        pollers and totals for each kind of poll
+    '''
+    with _lock:
+        pollers = list(_pollers.values())
+
+    totals = {}
+    for poller in pollers:
+        total = totals.setdefault(poller.kind, {'polls': 0, 'useful': 0})
+        total['polls'] += poller.polls
+        total['useful'] += poller.useful
+    for kind, total in totals.items():
+        total['efficiency'] = (float(total['useful']) / total['polls']
+                               if total['polls'] else None)
+
+    return {'pollers': [_.efficiency() for _ in pollers],
+            'totals': totals}
+
+
+class Budget:
+    ''' Token bucket limiting the requests per second shared by all
+        pollers of a kind in the process
+    '''
+    def __init__(self, rate, burst):
+
+        # Tokens added per second and maximum tokens
+        self.rate = float(rate)
+        self.burst = burst
+
+        # Available tokens
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        ''' Adds the tokens accrued since the last refill
+        '''
+        now = time.time()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, stop=None):
+        ''' Waits for a token.
+            Returns false if the stop event was set while waiting.
+        '''
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if stop is None:
+                time.sleep(wait)
+            elif stop.wait(wait):
+                return False
+
+
+class Poller:
+    ''' Adaptive poll interval for a game.
+        Keeps an exponentially weighted average of changes per second
+        and waits long enough to expect a target number of changes
+        each poll, within the interval limits for the kind of poll.
+        The game situation overrides the rate during halftime, after
+        timeouts and in the last two minutes of each half.
+    '''
+    def __init__(self, gameid, kind):
+
+        # Game id and kind of poll
+        self.gameid = gameid
+        self.kind = kind
+
+        # Interval limits
+        self.low, self.default, self.high = INTERVALS[kind]
+
+        # Average changes per second and last poll time
+        self.rate = None
+        self.last = None
+
+        # Game situation
+        self.qtr = None
+        self.clock = None
+        self.timeout = False
+
+        # Counters
+        self.polls = 0
+        self.useful = 0
+
+        # Set to poll before the interval has passed
+        self.woken = threading.Event()
+
+        with _lock:
+            _pollers[(kind, gameid)] = self
+
+    def record(self, changes, qtr=None, clock=None, timeout=False):
+        ''' Records the number of changes found by a poll and the
+            game situation when known
+        '''
+        now = time.time()
+
+        self.polls += 1
+        if changes:
+            self.useful += 1
+
+        # Update the average change rate
+        if self.last is not None and now > self.last:
+            rate = changes / (now - self.last)
+            self.rate = (rate if self.rate is None else
+                         ALPHA * rate + (1 - ALPHA) * self.rate)
+        self.last = now
+
+        # Update the game situation
+        if qtr is not None:
+            self.qtr = str(qtr)
+        if clock is not None:
+            self.clock = _seconds(clock)
+        self.timeout = timeout
+
+    def interval(self):
+        ''' Returns the seconds to wait before the next poll
+        '''
+        # Game situation
+        if self.qtr == 'Halftime':
+            return max(HALFTIME, self.high)
+        if self.qtr in ['2', '4'] and self.clock is not None and \
+                self.clock <= TWO_MINUTE:
+            return self.low
+        if self.timeout:
+            return TIMEOUT
+
+        # Observed change rate
+        if not self.rate:
+            return self.default if self.rate is None else self.high
+        return min(max(TARGET / self.rate, self.low), self.high)
+
+    def wait(self, stop=None):
+        ''' Waits for the next poll within the request budget.
+            Waits less when woken by a change seen elsewhere.
+            Returns true if the stop event was set while waiting.
+        '''
+        end = time.time() + self.interval()
+        while not self.woken.is_set():
+            seconds = end - time.time()
+            if seconds <= 0:
+                break
+            if stop is not None and stop.wait(min(seconds, 1)):
+                return True
+            if stop is None:
+                self.woken.wait(seconds)
+        self.woken.clear()
+
+        return not budget(self.kind).acquire(stop)
+
+    def wake(self):
+        ''' Ends the current wait so that the next poll starts now
+        '''
+        self.woken.set()
+
+    def efficiency(self):
+        ''' Returns a dictionary of the poll counters
+        '''
+        return {'gameid': self.gameid,
+                'kind': self.kind,
+                'polls': self.polls,
+                'useful': self.useful,
+                'efficiency': (float(self.useful) / self.polls
+                               if self.polls else None),
+                'interval': self.interval()}
+
+    def close(self):
+        ''' Removes the poller from the report
+        '''
+        with _lock:
+            if _pollers.get((self.kind, self.gameid)) is self:
+                del _pollers[(self.kind, self.gameid)]
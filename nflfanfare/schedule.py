@@ -453,35 +453,7 @@ class Schedule:
     def gameid_from_team_and_time(self, teamid, postedtime):
         ''' Returns gameid from a teamid and posted time
         '''
-        onehour = 60 * 60 * 1000
-        fourhours = 4 * onehour
-        result = ff.db.games.aggregate([
-            {'$project': {
-                'gameid': '$gameid',
-                'hometeam': '$hometeam',
-                'awayteam': '$awayteam',
-                'starttime': '$starttime',
-                'start': {'$subtract': ['$starttime', onehour]},
-                'end': {'$add': ['$starttime', fourhours]}
-            }
-            },
-            {'$match': {
-                '$and': [
-                    {'$or': [{'hometeam': teamid},
-                             {'awayteam': teamid}
-                             ]},
-                    {'start': {'$lt': postedtime}},
-                    {'end': {'$gte': postedtime}}
-                ]
-            }
-            }
-
-        ])
-        if result is not None:
-            for r in result:
-                if 'gameid' in r:
-                    return r['gameid']
-        return None
+        return ff.windows.index().gameid(teamid, postedtime)
 
     def game_teams(self, gameid):
         ''' Returns a dictionary of teams for a game
@@ -511,45 +483,23 @@ class Schedule:
             return "pending"
 
     def game_tweet_counts(self, gameid):
-        ''' Returns a dictionary of tweet counts for a game
+        ''' Returns a dictionary of tweet counts with sentiment for a game
         '''
-        counts = {}
-        teams = self.game_teams(gameid)
-        for t in teams:
-            result = ff.db.tweets.find({'gameid': gameid,
-                                        'teamid': teams[t],
-                                        'sentiment.sent_compound': {'$ne': 0}
-                                        }).count()
-            counts[t] = result
-
-        counts['total'] = counts['hometeam'] + counts['awayteam']
-        return counts
+        result = ff.db.games.find_one({'gameid': gameid}, {'sentcounts': 1})
+        counts = (result or {}).get('sentcounts') or {}
+        return {'hometeam': counts.get('hometeam', 0),
+                'awayteam': counts.get('awayteam', 0),
+                'total': counts.get('total', 0)}
 
     def update_game_tweet_counts(self, gameid):
-        ''' Updates tweet counts in database for a gameid
+        ''' Repairs the stored tweet counts in database for a gameid
         '''
-        counts = self.game_tweet_counts(gameid)
-
-        try:
-            result = ff.db.games.update_one(
-                {"gameid": gameid},
-                {
-                    "$set": {
-                        'tweetcounts.hometeam': counts['hometeam'],
-                        'tweetcounts.awayteam': counts['awayteam'],
-                        'tweetcounts.total': counts['total'],
-                    }
-                }
-            )
-        except:
-            print "Could not update %s tweet counts." % gameid
+        ff.games.reconcile_tweet_counts(gameid)
 
     def update_db_tweet_counts(self):
-        ''' Updates tweet counts for games in the database
+        ''' Repairs the stored tweet counts for games in the database
         '''
-        games = list(ff.db.games.find({}, {'gameid': 1, '_id': 0}))
-        for g in games:
-            self.update_game_tweet_counts(g['gameid'])
+        ff.games.reconcile_tweet_counts()
 
     def update_game_sentiment(self, gameid):
         ''' Updates game sentiment in database for a gameid
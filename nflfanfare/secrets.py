@@ -7,6 +7,13 @@ mysqlpwd = ""
 mongohost = ""
 mongouser = ""
 mongopwd = ""
+mongopoolsize = 50
+mongotimeout = 10000
+mongoreadpreference = "primary"
+
+cachebackend = "memory"
+
+nflbaseurl = "http://www.nfl.com"
 
 twitter_ckey = ""
 twitter_csec = ""
@@ -0,0 +1,65 @@
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import numpy as np
+import threading
+
+# Shared VADER analyzer for the process
+_analyzer = None
+_lock = threading.Lock()
+
+
+def analyzer():
+    ''' Returns the process-wide VADER analyzer.
+        The lexicon is loaded from disk on first use only.
+    '''
+    global _analyzer
+    if _analyzer is None:
+        with _lock:
+            if _analyzer is None:
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def reset():
+    ''' Drops the shared analyzer so the lexicon is reloaded
+        on next use
+    '''
+    global _analyzer
+    with _lock:
+        _analyzer = None
+
+
+def scores(texts):
+    ''' Scores a list of texts and returns a dictionary of
+        pos, neg, neu, and compound numpy arrays rounded to
+        three decimals
+    '''
+    sid = analyzer()
+
+    # Score each text with the shared analyzer
+    result = [sid.polarity_scores(text) for text in texts]
+
+    return {key: np.round(np.array([_[key] for _ in result],
+                                   dtype=float), 3)
+            for key in ['pos', 'neg', 'neu', 'compound']}
+
+
+def records(texts):
+    ''' Scores a list of texts and returns a list of tweet
+        sentiment dictionaries
+    '''
+    result = scores(texts)
+
+    return [{'sent_pos': float(pos),
+             'sent_neg': float(neg),
+             'sent_neu': float(neu),
+             'sent_compound': float(compound)}
+            for pos, neg, neu, compound in zip(result['pos'],
+                                               result['neg'],
+                                               result['neu'],
+                                               result['compound'])]
+
+
+def record(text):
+    ''' Returns a tweet sentiment dictionary for a single text
+    '''
+    return records([text])[0]
@@ -1,15 +1,23 @@
+from bson import json_util
+from bson.binary import Binary
 from datetime import datetime, timedelta
+import hashlib
 import json
+import numpy as np
 import pandas as pd
 import pymongo
 import pytz
 import tzlocal
+import zlib
 
 import nflfanfare as ff
 
 
-def schedule(week=None):
+def schedule(week=None, materialized=False):
     ''' Returns pandas dataframe of game info and tweet counts
+        Tweet counts are grouped in the database and merged onto the
+        games, or read from the counts stored on the game documents
+        when materialized is set.
     '''
     # Game information
     search = {'seasontype': {'$ne': 'PRE'}}
@@ -20,31 +28,37 @@ def schedule(week=None):
         sort([('gameid', pymongo.ASCENDING)])
     games = pd.DataFrame(list(result))
 
-    # Tweet counts by game and team id
-    result = ff.db.tweets.find({}, {'gameid': 1, 'teamid': 1})
-    counts = pd.DataFrame(list(result))
-    counts = counts.groupby(['gameid', 'teamid']).agg({'_id': 'count'}).\
-        reset_index().rename(columns={'_id': 'tweets'})
-
-    # Function to match hometeam and awayteam tweet counts
-    # Method is much faster than an aggregation pipeline in MongoDB
-    def lookup(x, team):
-        result = counts[(counts.gameid == x['gameid']) &
-                        (counts.teamid == x[team])].tweets
-        if result.empty:
-            return 0
-        return int(result)
-
-    # Look up hometeam and awayteam tweet counts
-    games['hometweets'] = games.apply(lambda x: lookup(x, 'hometeam'), axis=1)
-    games['awaytweets'] = games.apply(lambda x: lookup(x, 'awayteam'), axis=1)
+    if materialized:
+        # Tweet counts stored on the game documents
+        if 'tweetcounts' not in games:
+            games['tweetcounts'] = None
+        counts = [_ if isinstance(_, dict) else {}
+                  for _ in games.tweetcounts]
+        games['hometweets'] = [_.get('hometeam', 0) for _ in counts]
+        games['awaytweets'] = [_.get('awayteam', 0) for _ in counts]
+    else:
+        # Tweet counts grouped in the database
+        counts = _tweet_counts(games.gameid)
+
+        # Merge hometeam and awayteam tweet counts
+        games = games.merge(
+            counts.rename(columns={'teamid': 'hometeam',
+                                   'tweets': 'hometweets'}),
+            how='left', on=['gameid', 'hometeam'])
+        games = games.merge(
+            counts.rename(columns={'teamid': 'awayteam',
+                                   'tweets': 'awaytweets'}),
+            how='left', on=['gameid', 'awayteam'])
+
+    games['hometweets'] = games.hometweets.fillna(0).astype(int)
+    games['awaytweets'] = games.awaytweets.fillna(0).astype(int)
     games['totaltweets'] = games.hometweets + games.awaytweets
 
     # Subset columns in dataframe
     games = games[['gameid', 'week', 'seasontype', 'hometeam', 'awayteam',
                    'scheduled', 'hometweets', 'awaytweets', 'totaltweets']]
 
-    games['state'] = games.scheduled.apply(ff.games._state)
+    games['state'] = ff.games.states(games.scheduled)
 
     # Convert to UTC then local timezone
     local = tzlocal.get_localzone()
@@ -61,32 +75,160 @@ def schedule(week=None):
     return games
 
 
+def _version(values):
+    ''' Returns a short hash of a list of values
+    '''
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()[:16]
+
+
+def game_version(gameid):
+    ''' Returns a version hash and last modified time for the data of
+        a game from its state, score, tweet counts, and latest play
+    '''
+    game = ff.db.games.find_one({'gameid': gameid},
+                                {'scheduled': 1, 'status': 1,
+                                 'homescore': 1, 'awayscore': 1,
+                                 'tweetcounts': 1, 'sentcounts': 1,
+                                 'updated': 1})
+    if not game:
+        return None, None
+
+    # Latest play for the game
+    play = list(ff.db.plays.find({'gameid': gameid},
+                                 {'_id': 1, 'collected_time': 1}).
+                sort('playid', pymongo.DESCENDING).limit(1))
+    play = play[0] if play else {}
+
+    version = _version([ff.games._state(game['scheduled']),
+                        game.get('status'), game.get('homescore'),
+                        game.get('awayscore'), game.get('tweetcounts'),
+                        game.get('sentcounts'), play.get('_id')])
+    modified = max([_ for _ in [game.get('updated'), game['scheduled'],
+                                play.get('collected_time')] if _])
+    modified = min(modified, datetime.utcnow())
+
+    return version, modified
+
+
+def week_version(week=None):
+    ''' Returns a version hash and last modified time for the
+        schedule tweet counts of a week
+    '''
+    search = {'seasontype': {'$ne': 'PRE'}}
+    if week:
+        search['week'] = str(week)
+
+    games = list(ff.db.games.find(search,
+                                  {'gameid': 1, 'scheduled': 1,
+                                   'tweetcounts': 1, 'updated': 1}).
+                 sort([('gameid', pymongo.ASCENDING)]))
+    if not games:
+        return None, None
+
+    states = ff.games.states([_['scheduled'] for _ in games])
+    version = _version([(_['gameid'], state, _.get('tweetcounts'))
+                        for _, state in zip(games, states)])
+    modified = max([_.get('updated') or _['scheduled'] for _ in games])
+    modified = min(modified, datetime.utcnow())
+
+    return version, modified
+
+
+def build_snapshot(gameid, tweet_buckets=5):
+    ''' Stores the statistical data of a historic game as a single
+        compressed snapshot document. Returns true if a snapshot
+        was stored.
+    '''
+    game = Game(gameid, tweet_buckets, server=True, snapshot=False)
+    if not game.game.info or game.game.state != 'historic':
+        return False
+
+    data = game.data()
+    body = json.dumps(data, default=json_util.default).encode('utf-8')
+
+    ff.db.snapshots.replace_one(
+        {'_id': gameid},
+        {'_id': gameid,
+         'buckets': tweet_buckets,
+         'tweetcounts': data.get('tweetcounts'),
+         'built': datetime.utcnow(),
+         'data': Binary(zlib.compress(body))},
+        upsert=True)
+
+    return True
+
+
+def _tweet_counts(gameids):
+    ''' Returns a dataframe of tweet counts by gameid and teamid
+        for a list of gameids
+    '''
+    result = ff.db.tweets.aggregate([
+        {'$match': {'gameid': {'$in': list(gameids)}}},
+        {'$group': {'_id': {'gameid': '$gameid', 'teamid': '$teamid'},
+                    'tweets': {'$sum': 1}}}
+    ])
+
+    return pd.DataFrame([{'gameid': _['_id']['gameid'],
+                          'teamid': _['_id'].get('teamid'),
+                          'tweets': _['tweets']} for _ in result],
+                        columns=['gameid', 'teamid', 'tweets'])
+
+
 class Game():
     ''' Class for calculating game statistics
         Initialized based on a gameid string.
         The paramater tweet_buckets sets the number of minutes into
         which the gametime is divided when calculating the sentiment.
+        The parameter server buckets and aggregates the tweets in the
+        database instead of loading them. The parameter snapshot serves
+        historic games from their stored snapshot when available.
     '''
-    def __init__(self, gameid, tweet_buckets=5):
+    def __init__(self, gameid, tweet_buckets=5, server=False,
+                 snapshot=True):
 
         # Game id and game information
         self.gameid = gameid
         self.game = ff.games.Game(gameid)
 
-        if self.game.info:
+        # Bucket size and aggregation mode
+        self.buckets = tweet_buckets
+        self.server = server
+
+        # Stored snapshot data for historic games
+        self.snapshot = None
+        if snapshot and self.game.info and self.game.state == 'historic':
+            self.snapshot = self._snapshot()
+
+        if self.game.info and not self.snapshot:
 
             # Time series
-            self.times = None
+            self.times = self._times(tweet_buckets)
 
             # Game tweets
-            self.tweets = self._tweets()
-            self.tweets = self._timeseries(self.tweets,
-                                           tweet_buckets,
-                                           'postedtime')
+            if server:
+                self.tweets = None
+            else:
+                self.tweets = self._tweets()
+                self.tweets = self._timeseries(self.tweets,
+                                               tweet_buckets,
+                                               'postedtime')
 
             # Game plays
             self.plays = ff.plays.Plays(self.gameid)
 
+    def _snapshot(self):
+        ''' Returns the stored snapshot data for the game or None if
+            there is no snapshot for the bucket size or tweets have
+            been added since it was built
+        '''
+        result = ff.db.snapshots.find_one({'_id': self.gameid,
+                                           'buckets': self.buckets})
+        if (result and
+                result['tweetcounts'] == self.game.info.get('tweetcounts')):
+            return json.loads(zlib.decompress(result['data']).decode('utf-8'),
+                              object_hook=json_util.object_hook)
+        return None
+
     def _tweets(self):
         ''' Returns a dataframe containing the game tweets
         '''
@@ -108,6 +250,17 @@ class Game():
         # Create data frame
         return pd.DataFrame(list(tweets))
 
+    def _times(self, x):
+        ''' Returns a list of datetimes in x minute intervals
+            between the pre and post gametimes
+        '''
+        # Minutes between pre and post game
+        minutes = (self.game.postgame -
+                   self.game.pregame).seconds / 60
+
+        return [self.game.pregame + timedelta(minutes=_)
+                for _ in xrange(0, minutes, x)]
+
     def _timeseries(self, df, x, time_column):
         ''' Creates a time series for a game in x minute intervals
             between the pre and post gametimes using the
@@ -115,52 +268,93 @@ class Game():
             Returns a dataframe with the time group and gametime
             marked within new columns.
         '''
-        # Minutes between pre and post game
-        minutes = (self.game.postgame -
-                   self.game.pregame).seconds / 60
-
-        # Creates a list of datetimes in 5 minute intervals
-        self.times = [self.game.pregame + timedelta(minutes=_)
-                      for _ in xrange(0, minutes, x)]
+        # Creates a list of datetimes in x minute intervals
+        self.times = self._times(x)
 
         # Check if not empty
         if not df.empty:
 
-            # Set tweet postedtime as index
-            tindex = pd.DatetimeIndex(df[time_column])
-
-            # Creates an index of all the times within the dataframe
-            # between two times
-            for i in range(0, len(self.times)):
-                index = tindex.indexer_between_time(
-                    self.times[i].time(),
-                    (self.times[i] +
-                     timedelta(minutes=x)).time(),
-                    include_end=False)
+            # Number of x minute intervals since pregame
+            offset = pd.to_datetime(df[time_column]) - self.game.pregame
+            group = offset // pd.Timedelta(minutes=x)
 
-                # Mark the time group and gametime
-                df.ix[index, 'timegroup'] = i
-                df.ix[index, 'gametime'] = self.times[i]
+            # Mark the time group and gametime within the game window
+            window = (group >= 0) & (group < len(self.times))
+            df['timegroup'] = np.nan
+            df['gametime'] = pd.NaT
+            df.loc[window, 'timegroup'] = group[window]
+            df.loc[window, 'gametime'] = (
+                self.game.pregame +
+                pd.to_timedelta(group[window] * x, unit='m'))
 
         return df
 
+    def _group(self):
+        ''' Returns series of tweet counts and mean sentiment by
+            teamid and gametime from the game tweets
+        '''
+        if self.tweets.empty:
+            return pd.Series(), pd.Series()
+
+        # Group by teamid and timegroup
+        group = self.tweets.groupby(['teamid', 'gametime'])
+
+        return group.sent_compound.count(), group.sent_compound.mean()
+
+    def _aggregate(self):
+        ''' Returns series of tweet counts and mean sentiment by
+            teamid and gametime aggregated in the database
+        '''
+        # Bucket size in milliseconds and end of the last bucket
+        size = self.buckets * 60 * 1000
+        end = self.game.pregame + timedelta(
+            minutes=self.buckets * len(self.times))
+
+        # Milliseconds since pregame
+        offset = {'$subtract': ['$postedtime', self.game.pregame]}
+
+        result = ff.db.tweets.aggregate([
+            {'$match': {'gameid': self.gameid,
+                        'sentiment.sent_compound': {'$ne': 0},
+                        'postedtime': {'$gte': self.game.pregame,
+                                       '$lt': end}}},
+            {'$project': {'_id': 0,
+                          'teamid': '$teamid',
+                          'sent_compound': '$sentiment.sent_compound',
+                          'bucket': {'$subtract': [
+                              offset, {'$mod': [offset, size]}]}}},
+            {'$group': {'_id': {'teamid': '$teamid', 'bucket': '$bucket'},
+                        'count': {'$sum': 1},
+                        'mean': {'$avg': '$sent_compound'}}}
+        ])
+
+        df = pd.DataFrame([{'teamid': _['_id']['teamid'],
+                            'gametime': (self.game.pregame +
+                                         timedelta(milliseconds=_['_id']
+                                                   ['bucket'])),
+                            'count': _['count'],
+                            'mean': _['mean']} for _ in result],
+                          columns=['teamid', 'gametime', 'count', 'mean'])
+        df = df.set_index(['teamid', 'gametime']).sort_index()
+
+        return df['count'], df['mean']
+
     def _sentiment(self):
         ''' Returns a data frame of gametime sentiment
         '''
         # Set dataframe with times
         df = pd.DataFrame({'gametime': self.times})
 
-        if not self.tweets.empty:
+        # Aggregate columns by teamid and gametime
+        if self.server:
+            counts, means = self._aggregate()
+        else:
+            counts, means = self._group()
 
-            # Determine teams in game tweets
-            teams = self.tweets.teamid.unique()
+        if not counts.empty:
 
-            # Group by teamid and timegroup
-            group = self.tweets.groupby(['teamid', 'gametime'])
-
-            # Aggregate columns
-            counts = group.sent_compound.count()
-            means = group.sent_compound.mean()
+            # Determine teams in game tweets
+            teams = counts.index.get_level_values('teamid').unique()
 
             # Home team sentiment
             # Check if home team has tweets
@@ -200,9 +394,12 @@ class Game():
     def data(self):
         ''' Returns all statistical data for a game as a dictionary
         '''
+        # Stored snapshot for historic games
+        if self.snapshot:
+            return self.snapshot
+
         # Base game information
-        data = self.game.info
-        data.pop('info', None)
+        data = self.game.details()
 
         # Gametime sentiment
         sentiment = self._sentiment().to_dict(orient='records')
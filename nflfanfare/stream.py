@@ -0,0 +1,213 @@
+import logging
+import sys
+import threading
+import time
+
+try:
+    from queue import Empty, Full, Queue
+except ImportError:
+    from Queue import Empty, Full, Queue
+
+import nflfanfare as ff
+
+# Seconds between polls for live and finished games
+LIVE_INTERVAL = 5
+IDLE_INTERVAL = 60
+
+# Maximum number of undelivered updates per subscriber
+QUEUE_SIZE = 100
+
+# Consecutive failed polls before closing the streams and seconds
+# to back off after the first failure
+MAX_ERRORS = 5
+BACKOFF = 5
+
+# Producers by gameid
+_producers = {}
+_lock = threading.Lock()
+
+
+def subscribe(gameid):
+    ''' Returns a queue of live updates for a game.
+        Starts the game producer for the first subscriber.
+    '''
+    with _lock:
+        producer = _producers.get(gameid)
+        if producer is None or not producer.is_alive():
+            producer = Producer(gameid)
+            _producers[gameid] = producer
+            queue = producer.subscribe()
+            producer.start()
+        else:
+            queue = producer.subscribe()
+    return queue
+
+
+def unsubscribe(gameid, queue):
+    ''' Removes a subscriber queue from a game producer
+    '''
+    with _lock:
+        producer = _producers.get(gameid)
+        if producer:
+            producer.unsubscribe(queue)
+
+
+class Producer(threading.Thread):
+    ''' Polls a game for new plays and changed sentiment buckets and
+        fans the updates out to all subscribers of the game. Stops
+        when the last subscriber leaves.
+    '''
+    def __init__(self, gameid):
+        threading.Thread.__init__(self, name='stream-%s' % gameid)
+        self.daemon = True
+
+        # Game id and statistics
+        self.gameid = gameid
+        self.stats = None
+
+        # Subscriber queues
+        self.subscribers = set()
+
+        # Latest play id and sentiment buckets by gametime
+        self.lastplay = None
+        self.buckets = {}
+
+        # Logger
+        self.log = logging.getLogger('stream.Producer')
+
+    def subscribe(self):
+        ''' Adds and returns a subscriber queue
+        '''
+        queue = Queue(QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        ''' Removes a subscriber queue
+        '''
+        self.subscribers.discard(queue)
+
+    def _plays(self):
+        ''' Returns the plays added since the last poll
+        '''
+        search = {'gameid': self.gameid}
+        if self.lastplay is not None:
+            search['playid'] = {'$gt': self.lastplay}
+
+        # Check for new plays before reloading the game plays
+        latest = ff.db.plays.find_one(search, {'playid': 1, '_id': 0},
+                                      sort=[('playid', -1)])
+        if latest is None:
+            return []
+
+        # Timeouts depend on earlier plays so reload the whole game
+        plays = ff.plays.Plays(self.gameid).plays
+        if self.lastplay is not None:
+            plays = plays[plays.playid > self.lastplay]
+        self.lastplay = latest['playid']
+
+        return plays.sort_values('playid').to_dict(orient='records')
+
+    def _sentiment(self):
+        ''' Returns the sentiment buckets that changed since the
+            last poll
+        '''
+        changed = []
+        for bucket in self.stats._sentiment().to_dict(orient='records'):
+            if self.buckets.get(bucket['gametime']) != bucket:
+                self.buckets[bucket['gametime']] = bucket
+                changed.append(bucket)
+        return changed
+
+    def _close(self):
+        ''' Ends the stream of every subscriber
+        '''
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(None)
+            except Full:
+                # Make room for the end of stream
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    pass
+                queue.put(None)
+        self.subscribers = set()
+
+    def _publish(self, update):
+        ''' Sends an update to every subscriber and drops subscribers
+            that have stopped reading
+        '''
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(update)
+            except Full:
+                self.unsubscribe(queue)
+
+    def run(self):
+        ''' Polls the game until there are no subscribers.
+            Backs off after failed polls and closes the streams when
+            the game cannot be polled.
+        '''
+        failed = False
+        try:
+            self.stats = ff.stats.Game(self.gameid, server=True,
+                                       snapshot=False)
+            if not self.stats.game.info:
+                failed = True
+                return
+
+            # Current plays and buckets are already sent with the game data
+            self._plays()
+            self._sentiment()
+
+            errors = 0
+            while self.subscribers:
+                live = self.stats.game.state in ['starting', 'live']
+                self._wait(LIVE_INTERVAL if live else IDLE_INTERVAL)
+
+                try:
+                    plays, sentiment = self._plays(), self._sentiment()
+                    if plays or sentiment:
+                        self._publish({'plays': plays,
+                                       'sentiment': sentiment})
+
+                    # Refresh the game state
+                    self.stats.game.state = ff.games._state(
+                        self.stats.game.scheduled)
+                    errors = 0
+                except:
+                    errors += 1
+                    if errors >= MAX_ERRORS:
+                        raise
+                    self.log.warn('Could not poll %s: %s' %
+                                  (self.gameid, sys.exc_info()[1]))
+                    self._wait(BACKOFF * 2 ** (errors - 1))
+        except:
+            failed = True
+            self.log.error('Unknown error streaming %s: %s' %
+                           (self.gameid, sys.exc_info()[1]))
+        finally:
+            with _lock:
+                if _producers.get(self.gameid) is self:
+                    del _producers[self.gameid]
+
+                    # Hand subscribers that joined while stopping to
+                    # a new producer, or end their streams on errors
+                    if failed:
+                        self._close()
+                    elif self.subscribers and self.stats and \
+                            self.stats.game.info:
+                        producer = Producer(self.gameid)
+                        producer.subscribers = self.subscribers
+                        _producers[self.gameid] = producer
+                        producer.start()
+
+    def _wait(self, seconds):
+        ''' Waits between polls, returning early when the last
+            subscriber leaves
+        '''
+        for _ in range(int(seconds)):
+            if not self.subscribers:
+                return
+            time.sleep(1)
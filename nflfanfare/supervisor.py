@@ -0,0 +1,364 @@
+import ctypes
+from datetime import datetime
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+import nflfanfare as ff
+
+
+def _rss():
+    ''' Returns the resident memory of the process in megabytes
+    '''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.
+    except IOError:
+        pass
+
+    # Peak resident memory when /proc is unavailable
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def _tid():
+    ''' Returns the native id of the current thread or None
+    '''
+    native_id = getattr(threading, 'get_native_id', None)
+    if native_id:
+        return native_id()
+
+    # Linux gettid system call
+    try:
+        syscall = ctypes.CDLL(None, use_errno=True).syscall
+        tid = syscall({'x86_64': 186, 'i686': 224, 'i386': 224,
+                       'aarch64': 178, 'armv7l': 224}[os.uname()[4]])
+        return tid if tid > 0 else None
+    except (AttributeError, KeyError, OSError):
+        return None
+
+
+def _cpu(tid):
+    ''' Returns the user and system CPU seconds used by a thread
+    '''
+    if tid is None:
+        return None
+    try:
+        with open('/proc/self/task/%s/stat' % tid) as f:
+            stat = f.read().rsplit(')', 1)[1].split()
+        ticks = float(os.sysconf('SC_CLK_TCK'))
+        return (int(stat[11]) + int(stat[12])) / ticks
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+
+
+class Task:
+    ''' Monitoring task for a single game running in a worker thread.
+        The target is called with the gameid and a stop event that
+        is set when the task is cancelled.
+    '''
+    def __init__(self, gameid, kind, target):
+
+        # Task information
+        self.gameid = gameid
+        self.kind = kind
+        self.target = target
+
+        # Cancellation event
+        self.stop = threading.Event()
+
+        # Usage information
+        self.tid = None
+        self.cpu = None
+        self.started = None
+        self.ended = None
+
+        # Logger
+        self.log = logging.getLogger('supervisor.Supervisor')
+
+        self.thread = threading.Thread(target=self._run,
+                                       name='%s-%s' % (kind, gameid))
+        self.thread.daemon = True
+
+    def _run(self):
+        ''' Runs the target and records the thread CPU usage
+        '''
+        self.tid = _tid()
+
+        try:
+            self.target(self.gameid, self.stop)
+        except:
+            self.log.error('Unknown error in %s task for %s: %s' %
+                           (self.kind, self.gameid, sys.exc_info()[1]))
+        finally:
+            self.cpu = _cpu(self.tid)
+            self.ended = datetime.utcnow()
+
+    def start(self):
+        ''' Starts the task thread
+        '''
+        self.started = datetime.utcnow()
+        self.thread.start()
+
+    def cancel(self):
+        ''' Asks the task to stop at its next wait
+        '''
+        self.stop.set()
+
+    def running(self):
+        ''' Returns true if the task thread is alive
+        '''
+        return self.thread.is_alive()
+
+    def usage(self):
+        ''' Returns a dictionary of the task usage
+        '''
+        now = self.ended or datetime.utcnow()
+        return {'gameid': self.gameid,
+                'kind': self.kind,
+                'running': self.running(),
+                'cancelled': self.stop.is_set(),
+                'cpu': _cpu(self.tid) if self.running() else self.cpu,
+                'runtime': ((now - self.started).total_seconds()
+                            if self.started else 0)}
+
+
+class Supervisor:
+    ''' Monitors the plays and tweets of all live games in a single
+        process. Each game runs as a task in a bounded pool of
+        threads. Play monitors are woken when the scorestrip shows
+        the game final so that they finish the game themselves.
+    '''
+    def __init__(self, max_workers=32, interval=60, scores_interval=15):
+
+        # Maximum number of concurrent tasks
+        self.max_workers = max_workers
+
+        # Maximum seconds between task checks and seconds between
+        # scorestrip polls
+        self.interval = interval
+        self.scores_interval = scores_interval
+
+        # Scorestrip poller and games that have gone final
+        self.collector = ff.gc.Collector(update=False)
+        self.final = set()
+
+        # Game state transitions and the last usage log time
+        self.lifecycle = ff.lifecycle.Scheduler(self._transition)
+        self.logged = None
+
+        # Tasks by kind and gameid, and tasks waiting for a worker
+        self.tasks = {}
+        self.queue = []
+
+        # Recent games waiting for and with started tweet collection
+        self.recent = set()
+        self.collected = set()
+
+        # Stop event for the supervisor
+        self.stopped = threading.Event()
+
+        # Logger
+        self.log = logging.getLogger('supervisor.Supervisor')
+
+    def _plays(self, gameid, stop):
+        ''' Monitors the plays for a game
+        '''
+        ff.gc.Collector(update=False)._monitor(gameid, stop)
+
+    def _tweets(self, gameid, stop):
+        ''' Collects the tweets for a game
+        '''
+        ff.twitter.Collector().collect_game(gameid, stop)
+
+    def start(self, gameid, kind):
+        ''' Queues a plays or tweets task for a game unless one is
+            already queued or running
+        '''
+        key = (kind, gameid)
+        if key in self.tasks and not self.tasks[key].ended:
+            return
+
+        target = self._plays if kind == 'plays' else self._tweets
+        self.tasks[key] = Task(gameid, kind, target)
+        self.queue.append(key)
+
+    def cancel(self, gameid, kind=None):
+        ''' Cancels the tasks for a game
+        '''
+        for key, task in self.tasks.items():
+            if task.gameid == gameid and (kind is None or task.kind == kind):
+                if not task.stop.is_set():
+                    self.log.info('Cancelling %s task for game %s.' %
+                                  (task.kind, gameid))
+                task.cancel()
+
+    def _dispatch(self):
+        ''' Starts queued tasks while workers are available
+        '''
+        running = len([_ for _ in self.tasks.values() if _.running()])
+
+        while self.queue and running < self.max_workers:
+            key = self.queue.pop(0)
+            task = self.tasks[key]
+
+            # Skip tasks cancelled before they started
+            if task.stop.is_set():
+                task.ended = datetime.utcnow()
+                continue
+
+            self.log.info('Starting %s task for game %s.' %
+                          (task.kind, task.gameid))
+            task.start()
+            running += 1
+
+    def _reap(self):
+        ''' Removes finished tasks and logs their usage
+        '''
+        for key in list(self.tasks.keys()):
+            task = self.tasks[key]
+            if task.ended and not task.running():
+                usage = task.usage()
+                self.log.info('Finished %s task for game %s in %.0f seconds '
+                              'using %s CPU seconds.' %
+                              (task.kind, task.gameid, usage['runtime'],
+                               usage['cpu']))
+
+                del self.tasks[key]
+
+    def _scores(self):
+        ''' Polls the scorestrip and passes games whose score or
+            status changed to their play monitors
+        '''
+        changed = self.collector._poll()
+        for i, game in changed.iterrows():
+
+            # Wake play monitors of final games so they collect the
+            # final plays, mark the game ended and stop
+            if game['status'] in ['F', 'FO']:
+                self.final.add(game['gameid'])
+                ff.polling.wake('plays', game['gameid'])
+
+            # Poll the game feed now for starting and live games
+            elif game['state'] in ['starting', 'live']:
+                self.start(game['gameid'], 'plays')
+                ff.polling.wake('plays', game['gameid'])
+
+    def _transition(self, gameid, state):
+        ''' Starts and stops the tasks of a game when its state changes
+        '''
+        # Play monitors for starting and live games
+        if state in ['starting', 'live'] and gameid not in self.final:
+            self.start(gameid, 'plays')
+
+        # Tweet collectors for upcoming, starting, and live games
+        if state in ['upcoming', 'starting', 'live']:
+            self.start(gameid, 'tweets')
+
+        # Stop live collection and collect recent tweets once
+        if state == 'recent':
+            self.cancel(gameid)
+            if gameid not in self.collected:
+                self.recent.add(gameid)
+
+        if state == 'historic':
+            self.cancel(gameid)
+
+    def _collect_recent(self):
+        ''' Starts recent tweet collection for games whose live
+            collection has finished
+        '''
+        for gameid in list(self.recent):
+            task = self.tasks.get(('tweets', gameid))
+            if task and not task.ended:
+                continue
+            self.recent.discard(gameid)
+            self.collected.add(gameid)
+            self.start(gameid, 'tweets')
+
+    def _monitoring(self):
+        ''' Returns true if any play monitors are queued or running
+        '''
+        return any(kind == 'plays' and not task.ended
+                   for (kind, gameid), task in self.tasks.items())
+
+    def report(self):
+        ''' Returns a list of usage dictionaries for the tasks, the
+            poll efficiency and the resident memory of the process in
+            megabytes
+        '''
+        return {'tasks': [_.usage() for _ in self.tasks.values()],
+                'polling': ff.polling.report(),
+                'rss': _rss()}
+
+    def _log(self):
+        ''' Logs the task usage and poll efficiency
+        '''
+        report = self.report()
+        for usage in report['tasks']:
+            self.log.info('Task %s %s: running %s, %.0f seconds, '
+                          '%s CPU seconds.' %
+                          (usage['kind'], usage['gameid'],
+                           usage['running'], usage['runtime'],
+                           usage['cpu']))
+        for kind, total in report['polling']['totals'].items():
+            if total['polls']:
+                self.log.info('Polled %s %s times, %.0f%% useful.' %
+                              (kind, total['polls'],
+                               100 * total['efficiency']))
+        self.log.info('Supervising %s tasks using %.0f MB.' %
+                      (len(report['tasks']), report['rss']))
+
+    def run(self):
+        ''' Starts and stops tasks at game state transitions, polls
+            the scorestrip while games are monitored and supervises
+            tasks until stopped
+        '''
+        self.log.info('Supervisor started.')
+
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.lifecycle.step()
+                    self._collect_recent()
+
+                    # Poll the scorestrip while games are monitored
+                    if self._monitoring():
+                        self._scores()
+                except:
+                    self.log.error('Unknown error: %s line %s: %s' %
+                                   (sys.exc_info()[0],
+                                    sys.exc_info()[2].tb_lineno,
+                                    sys.exc_info()[1]))
+
+                self._reap()
+                self._dispatch()
+
+                # Log task usage every interval
+                if (self.logged is None or
+                        time.time() - self.logged >= self.interval):
+                    self.logged = time.time()
+                    self._log()
+
+                # Wait for the next transition or scorestrip poll
+                seconds = min(self.lifecycle.seconds(), self.interval)
+                if self._monitoring():
+                    seconds = min(seconds, self.scores_interval)
+                self.stopped.wait(seconds)
+        finally:
+            self.shutdown()
+
+    def shutdown(self, timeout=30):
+        ''' Cancels all tasks and waits for them to finish
+        '''
+        self.stopped.set()
+        for task in self.tasks.values():
+            task.cancel()
+        for task in self.tasks.values():
+            if task.started:
+                task.thread.join(timeout)
+        self.log.info('Supervisor stopped.')
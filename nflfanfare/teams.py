@@ -1,8 +1,13 @@
 import pandas as pd
 import random
+import threading
 
 import nflfanfare as ff
 
+# Shared team lookup for the process
+_registry = None
+_lock = threading.Lock()
+
 
 def team_ids():
     ''' Returns the NFL team ids in the database as a list
@@ -18,6 +23,58 @@ def teams():
     return pd.DataFrame(list(ff.db.teams.find({}, {'_id': 0})))
 
 
+def registry():
+    ''' Returns the shared team lookup dictionary.
+        Maps NFL ID, PFR ID, Twitter username, full team name,
+        team name, and hashtag to a team record. Loaded from the
+        database on first use.
+    '''
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = _build_registry()
+    return _registry
+
+
+def invalidate():
+    ''' Drops the shared team lookup so that it is reloaded
+        from the database on next use
+    '''
+    global _registry
+    with _lock:
+        _registry = None
+
+
+def _build_registry():
+    ''' Builds the team lookup dictionary from the database.
+        Later keys take priority when identifiers collide,
+        matching the order teamid, pfrid, username, fullname,
+        teamname, and hashtag.
+    '''
+    records = list(ff.db.teams.find({}, {'_id': 0}))
+
+    # Add full name for teams
+    for record in records:
+        record['fullname'] = record['teamcity'] + ' ' + record['teamname']
+
+    lookup = {}
+    for column in ['teamid', 'pfrid', 'username', 'fullname', 'teamname']:
+        matches = {}
+        for record in records:
+            matches.setdefault(record[column], record)
+        lookup.update(matches)
+
+    # Hashtags
+    matches = {}
+    for record in records:
+        for hashtag in record['hashtags']:
+            matches.setdefault(hashtag, record)
+    lookup.update(matches)
+
+    return lookup
+
+
 class Team:
     ''' Class for handling team information
     '''
@@ -50,43 +107,13 @@ class Team:
             self._properties()
 
     def _info(self):
-        ''' Returns a team info dictionary from the teams dataframe.
+        ''' Returns a team info dictionary from the team lookup.
             Allows for matching by NFL ID, PFR ID, Twitter username,
             and full team name, team name, and hashtag.
         '''
-        # Data frame of all teams in database
-        df = teams()
-
-        # Add full name for teams
-        df['fullname'] = (df.teamcity + ' ' + df.teamname)
-
-        column = None
-        # NFL ID
-        if self.match in list(df.teamid):
-            column = 'df.teamid'
-        # PFR ID
-        if self.match in list(df.pfrid):
-            column = 'df.pfrid'
-        # Twitter username
-        if self.match in list(df.username):
-            column = 'df.username'
-        # Full name
-        if self.match in list(df.fullname):
-            column = 'df.fullname'
-        # Team name
-        if self.match in list(df.teamname):
-            column = 'df.teamname'
-        # Hashtag
-        if self.match in [_ for h in list(df.hashtags) for _ in h]:
-            # Convert hashtag lists in dataframe to string
-            hashstr = df.hashtags.apply(lambda x: ' '.join(x))
-            return df[hashstr.str.contains(self.match)].\
-                to_dict(orient='records')[0]
-
-        # Return dictionary if match
-        if column:
-            return df[eval(column) == self.match].\
-                   to_dict(orient='records')[0]
+        record = registry().get(self.match)
+        if record:
+            return dict(record)
         return None
 
     def _properties(self):
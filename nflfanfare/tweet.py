@@ -1,7 +1,8 @@
 from datetime import datetime
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import re
 
+from nflfanfare import sentiment
+
 
 class Tweet:
     ''' Returns tweet object from API result
@@ -40,11 +41,11 @@ class Tweet:
         self.retweeted = False if 'retweeted_status' not in tweet else True
 
         # Sentiment information
-        sid = SentimentIntensityAnalyzer().polarity_scores(tweet['text'])
-        self.sent_pos = round(sid['pos'], 3)
-        self.sent_neg = round(sid['neg'], 3)
-        self.sent_neu = round(sid['neu'], 3)
-        self.sent_compound = round(sid['compound'], 3)
+        sid = sentiment.record(tweet['text'])
+        self.sent_pos = sid['sent_pos']
+        self.sent_neg = sid['sent_neg']
+        self.sent_neu = sid['sent_neu']
+        self.sent_compound = sid['sent_compound']
 
 
 class Scrape:
@@ -82,11 +83,11 @@ class Scrape:
         self.collectedtime = datetime.utcnow()
 
         # Sentiment information
-        sid = SentimentIntensityAnalyzer().polarity_scores(self.tweettext)
-        self.sent_pos = round(sid['pos'], 3)
-        self.sent_neg = round(sid['neg'], 3)
-        self.sent_neu = round(sid['neu'], 3)
-        self.sent_compound = round(sid['compound'], 3)
+        sid = sentiment.record(self.tweettext)
+        self.sent_pos = sid['sent_pos']
+        self.sent_neg = sid['sent_neg']
+        self.sent_neu = sid['sent_neu']
+        self.sent_compound = sid['sent_compound']
 
 
 class Bulk:
@@ -118,8 +119,8 @@ class Bulk:
         self.collectedtime = datetime.utcnow()
 
         # Sentiment information
-        sid = SentimentIntensityAnalyzer().polarity_scores(self.tweettext)
-        self.sent_pos = round(sid['pos'], 3)
-        self.sent_neg = round(sid['neg'], 3)
-        self.sent_neu = round(sid['neu'], 3)
-        self.sent_compound = round(sid['compound'], 3)
+        sid = sentiment.record(self.tweettext)
+        self.sent_pos = sid['sent_pos']
+        self.sent_neg = sid['sent_neg']
+        self.sent_neu = sid['sent_neu']
+        self.sent_compound = sid['sent_compound']
@@ -1,8 +1,8 @@
 from datetime import datetime, timedelta
 import json
 import logging
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 import pytz
 import random
 import re
@@ -26,6 +26,9 @@ class API:
 
         self.log = logging.getLogger('twitter.API')
 
+        # Buffered tweet writer
+        self.writer = Writer()
+
     def _quota(self, request):
         ''' Returns quota information for API request
         '''
@@ -37,9 +40,11 @@ class API:
 
         return quota
 
-    def search(self, search, until=None):
+    def search(self, search, until=None, since=None):
         ''' Searches for term and adds tweets to the database
             Waits if API quota has been met
+            Counts the collected tweets newer than the since tweetid
+            as new, whether or not they have been flushed yet.
         '''
         result = self.api.request('search/tweets',
                                   {'q': search,
@@ -49,9 +54,6 @@ class API:
         remaining = int(result.response.headers['x-rate-limit-remaining'])
         reset = float(result.response.headers['x-rate-limit-reset'])
 
-        # Counters
-        added = 0
-
         # Finds the time until quota reset and sleeps
         if remaining == 0:
             delta = datetime.fromtimestamp(reset) - datetime.now()
@@ -60,17 +62,41 @@ class API:
             time.sleep(delta.total_seconds())
             result = self.api.request('search/tweets' % int(tweetid))
 
-        tweets = [Tweet(_, search=search) for _ in list(result)]
+        # Score the sentiment of the page in one batch
+        items = list(result)
+        sentiments = ff.sentiment.records([_['text'] for _ in items])
+
+        # Look up the games of the page in one pass
+        teamid = ff.teams.Team(search).teamid
+        gameids = ff.windows.index().gameids(
+            (teamid, datetime.strptime(_['created_at'],
+                                       '%a %b %d %H:%M:%S +0000 %Y'))
+            for _ in items) if teamid else [None] * len(items)
+
+        tweets = [Tweet(_, search=search, sentiment=sentiment, gameid=gameid)
+                  for _, sentiment, gameid in zip(items, sentiments,
+                                                  gameids)]
+        new, latest = 0, since
         for tweet in tweets:
+            if latest is None or tweet.tweetid > latest:
+                latest = tweet.tweetid
+
             # Exclude retweets and tweets without a gameid
             if not tweet.retweeted:
                 if tweet.gameid:
-                    if tweet._add_db():
-                        added += 1
+                    self.writer.add(tweet)
+                    if since is None or tweet.tweetid > since:
+                        new += 1
+
+        # Flush buffered tweets if the buffer is full or old
+        flushed = self.writer.flush()
 
         # Return statistics
         return {'search': search,
-                'added': added,
+                'added': flushed['added'],
+                'duplicates': flushed['duplicates'],
+                'new': new,
+                'latest': latest,
                 'total': len(tweets)}
 
     def pager(self, search, start, end):
@@ -105,8 +131,8 @@ class API:
                                    'until': str(endstamp)})
         quota = self._quota('/search/tweets')
 
-        # Added counter
-        added, total = 0, 0
+        # Counters
+        added, duplicates, total = 0, 0, 0
 
         for item in result.get_iterator():
 
@@ -119,8 +145,12 @@ class API:
                 # Exclude retweets and tweets outside of pre and post game
                 if not tweet.retweeted:
                     if tweet.postedtime >= start and tweet.postedtime <= end:
-                        if tweet._add_db():
-                            added += 1
+                        self.writer.add(tweet)
+
+                        # Flush buffered tweets if full or old
+                        flushed = self.writer.flush()
+                        added += flushed['added']
+                        duplicates += flushed['duplicates']
 
                 total += 1
 
@@ -131,12 +161,152 @@ class API:
                               'Waiting %s seconds.' % delta.total_seconds())
                 time.sleep(delta.total_seconds())
 
+        # Flush remaining buffered tweets
+        flushed = self.writer.flush(force=True)
+        added += flushed['added']
+        duplicates += flushed['duplicates']
+
         # Return statistics
         return {'search': search,
                 'added': added,
+                'duplicates': duplicates,
                 'total': total}
 
 
+class Writer:
+    ''' Buffered tweet writer
+        Accumulates parsed tweets and flushes them to the database
+        with unordered bulk inserts once the buffer reaches a size
+        or age limit. Duplicates are dropped by the unique tweetid
+        index.
+    '''
+    def __init__(self, size=500, age=10):
+
+        # Flush limits for buffer size and age in seconds
+        self.size = size
+        self.age = timedelta(seconds=age)
+
+        # Buffered tweet documents by tweetid
+        self.buffer = {}
+        self.started = None
+
+        # Duplicates dropped within the buffer
+        self.duplicates = 0
+
+        # Logger
+        self.log = logging.getLogger('twitter.Writer')
+
+    def add(self, tweet):
+        ''' Adds a tweet to the buffer
+        '''
+        if not self.buffer:
+            self.started = datetime.utcnow()
+
+        if tweet.tweetid in self.buffer:
+            self.duplicates += 1
+        else:
+            self.buffer[tweet.tweetid] = tweet._dict()
+
+    def _due(self):
+        ''' Returns true if the buffer is full or old
+        '''
+        if not self.buffer:
+            return False
+        return (len(self.buffer) >= self.size or
+                datetime.utcnow() - self.started >= self.age)
+
+    def flush(self, force=False):
+        ''' Inserts the buffered tweets if the buffer is due or if
+            forced and returns the added and duplicate counts
+        '''
+        if not (force and self.buffer) and not self._due():
+            return {'added': 0, 'duplicates': 0}
+
+        tweets = list(self.buffer.values())
+        added, duplicates = 0, self.duplicates
+
+        # Reset the buffer
+        self.buffer = {}
+        self.started = None
+        self.duplicates = 0
+
+        # Positions of tweets that were not inserted
+        failed = set()
+
+        try:
+            result = ff.db.tweets.insert_many(tweets, ordered=False)
+            added = len(result.inserted_ids)
+
+        except BulkWriteError as e:
+            added = e.details['nInserted']
+
+            # Count duplicate key errors and log anything else
+            for error in e.details['writeErrors']:
+                failed.add(error['index'])
+                if error['code'] == 11000:
+                    duplicates += 1
+                else:
+                    self.log.error('Could not insert tweet %s: %s' %
+                                   (error['op']['tweetid'],
+                                    error['errmsg']))
+
+        except PyMongoError:
+            # Keep the tweets for the next flush
+            self._restore(tweets, duplicates)
+            self.log.error('Could not flush %s tweets: %s' %
+                           (len(tweets), sys.exc_info()[1]))
+            return {'added': 0, 'duplicates': 0}
+
+        # Update the stored game tweet counts
+        self._count([_ for i, _ in enumerate(tweets) if i not in failed])
+
+        self.log.info('Flushed %s tweets: %s added, %s duplicates.' %
+                      (len(tweets), added, duplicates))
+
+        return {'added': added, 'duplicates': duplicates}
+
+    def _restore(self, tweets, duplicates):
+        ''' Returns tweets from a failed flush to the buffer
+        '''
+        for tweet in tweets:
+            self.buffer.setdefault(tweet['tweetid'], tweet)
+        self.started = self.started or datetime.utcnow()
+        self.duplicates += duplicates
+
+    def _count(self, tweets):
+        ''' Increments the stored tweet counts of each game for the
+            inserted tweets, split by team and by nonzero sentiment
+        '''
+        index = ff.windows.index()
+
+        # Count increments by gameid
+        increments = {}
+        for tweet in tweets:
+            side = index.side(tweet.get('gameid'), tweet.get('teamid'))
+            if side is None:
+                continue
+
+            keys = ['tweetcounts.%s' % side, 'tweetcounts.total']
+            if tweet['sentiment']['sent_compound'] != 0:
+                keys += ['sentcounts.%s' % side, 'sentcounts.total']
+
+            inc = increments.setdefault(tweet['gameid'], {})
+            for key in keys:
+                inc[key] = inc.get(key, 0) + 1
+
+        if increments:
+            now = datetime.utcnow()
+            ff.db.games.bulk_write([UpdateOne({'_id': gameid},
+                                              {'$inc': inc,
+                                               '$set': {'updated': now}})
+                                    for gameid, inc in increments.items()],
+                                   ordered=False)
+
+            # Drop cached responses for the games
+            for gameid in increments:
+                ff.cache.invalidate_game(gameid)
+
+
 class Collector:
     ''' Class for collecting tweets
     '''
@@ -203,13 +373,14 @@ class Collector:
                                      close_fds=True)
             sys.exit(1)
 
-    def collect_game(self, gameid):
+    def collect_game(self, gameid, stop=None):
         ''' Collects tweets for a game
             Determines if a game is recent or live.
             Uses the API pager for recent games and the API search
             for upcoming, starting, or live games.
             Recent collection of tweets skips colletion for any team
             that has more than 8000 in the database.
+            Stops early when the optional stop event is set.
         '''
         # Game information
         game = ff.games.Game(gameid)
@@ -238,6 +409,10 @@ class Collector:
 
                 for hashtag in hashtags:
 
+                    # Stop if collection was cancelled
+                    if stop is not None and stop.is_set():
+                        break
+
                     # Log hashtag starting
                     self.log.info('Starting %s collection for %s' %
                                   (hashtag, game.gameid))
@@ -275,6 +450,10 @@ class Collector:
             # Teams hashtag pool
             hashtags = hometeam.hashtags + awayteam.hashtags
 
+            # Adaptive poll interval and latest tweetid by hashtag
+            poller = ff.polling.Poller(gameid, 'tweets')
+            latest = {}
+
             try:
                 # Mark game as being scraped
                 ff.db.games.update_one({'_id': game.gameid},
@@ -286,13 +465,17 @@ class Collector:
                     # Update now time
                     now = datetime.utcnow()
 
-                    try:
-                        # Wait a random lognormal amount of seconds
-                        time.sleep(np.random.lognormal(2, .5, 1)[0])
+                    # Wait for the next poll
+                    if poller.wait(stop):
+                        break
 
+                    try:
                         # Choose and API search a random hashtag
                         hashtag = random.choice(hashtags)
-                        result = self.api.search(hashtag)
+                        result = self.api.search(hashtag,
+                                                 since=latest.get(hashtag))
+                        latest[hashtag] = result['latest']
+                        poller.record(result['new'])
 
                         # Log collection update
                         self.log.info('Added %s of %s %s tweets to the '
@@ -301,7 +484,7 @@ class Collector:
                                                             result['search'],
                                                             game.gameid))
                     except:
-                        pass
+                        poller.record(0)
 
             except:
                 self.log.error('Unknown error: %s line %s: %s' %
@@ -310,6 +493,20 @@ class Collector:
                                 sys.exc_info()[1]))
 
             finally:
+                # Write any buffered tweets
+                try:
+                    self.api.writer.flush(force=True)
+                except:
+                    self.log.error('Could not flush tweets for game %s: %s' %
+                                   (gameid, sys.exc_info()[1]))
+
+                # Report poll efficiency
+                usage = poller.efficiency()
+                self.log.info('Searched tweets for game %s %s times, %s '
+                              'with new tweets.' % (gameid, usage['polls'],
+                                                    usage['useful']))
+                poller.close()
+
                 # Mark game as finished
                 ff.db.games.update_one({'_id': gameid},
                                        {'$unset': {'twitter': ''}})
@@ -332,6 +529,9 @@ class Tweet:
         self.search = None
         self.teamid = None
 
+        # Precomputed sentiment information
+        self.sentiment = None
+
         # Keyword information
         for key in kwargs.keys():
             setattr(self, key, kwargs[key])
@@ -359,10 +559,12 @@ class Tweet:
         self.user = self._user_info(tweet)
 
         # Sentiment information
-        self.sentiment = self._sentiment(tweet)
+        if not self.sentiment:
+            self.sentiment = self._sentiment(tweet)
 
-        # Game information
-        self.gameid = self._gameid()
+        # Game information unless looked up with the page
+        if 'gameid' not in kwargs:
+            self.gameid = self._gameid()
 
     def _user_info(self, tweet):
         ''' Returns user information dictionary for a tweet
@@ -382,73 +584,16 @@ class Tweet:
     def _sentiment(self, tweet):
         ''' Returns sentiment dictionary for a tweet
         '''
-        sid = SentimentIntensityAnalyzer().polarity_scores(tweet['text'])
-
-        return {
-            'sent_pos': round(sid['pos'], 3),
-            'sent_neg':  round(sid['neg'], 3),
-            'sent_neu':  round(sid['neu'], 3),
-            'sent_compound':  round(sid['compound'], 3)
-        }
-
-    def _in_db(self):
-        ''' Returns true if tweet is in database
-        '''
-        if ff.db.tweets.find_one({'tweetid': self.tweetid}):
-            return True
-        else:
-            return False
+        return ff.sentiment.record(tweet['text'])
 
     def _gameid(self):
         ''' Returns the gameid for a tweet based on posted time and teamid
         '''
         if self.teamid:
-            onehour = 60 * 60 * 1000
-            fourhours = 4 * onehour
-            result = ff.db.games.aggregate([
-                {'$project': {
-                    'gameid': '$gameid',
-                    'hometeam': '$hometeam',
-                    'awayteam': '$awayteam',
-                    'scheduled': '$scheduled',
-                    'start': {'$subtract': ['$scheduled', onehour]},
-                    'end': {'$add': ['$scheduled', fourhours]}
-                }
-                },
-                {'$match': {
-                    '$and': [
-                        {'$or': [{'hometeam': self.teamid},
-                                 {'awayteam': self.teamid}
-                                 ]},
-                        {'start': {'$lte': self.postedtime}},
-                        {'end': {'$gte': self.postedtime}}
-                    ]
-                }
-                }
-
-            ])
-
-            if result:
-                for r in result:
-                    if 'gameid' in r:
-                        return r['gameid']
-            return None
+            return ff.windows.index().gameid(self.teamid, self.postedtime)
+        return None
 
     def _dict(self):
         ''' Returns a dictionary for the tweet object
         '''
         return vars(self)
-
-    def _add_db(self):
-        ''' Adds the tweet to the database
-        '''
-        try:
-            # Skip if retweeted
-            if not self.retweeted:
-                # Check if tweet is in database
-                if not self._in_db():
-                    result = ff.db.tweets.insert_one(self._dict())
-                    return True
-            return False
-        except:
-            pass
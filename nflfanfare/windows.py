@@ -0,0 +1,150 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+import numpy as np
+import threading
+
+import nflfanfare as ff
+
+# Game window around the scheduled start time
+PREGAME = timedelta(hours=1)
+POSTGAME = timedelta(hours=4)
+
+# Maximum age of the shared index before it is rebuilt
+MAX_AGE = timedelta(minutes=15)
+
+# Shared index for the process
+_index = None
+_lock = threading.Lock()
+
+
+def index():
+    ''' Returns the shared game window index.
+        The index is rebuilt when it has been invalidated or is
+        older than the maximum age.
+    '''
+    global _index
+    with _lock:
+        if _index is None or _index.built < datetime.utcnow() - MAX_AGE:
+            _index = Windows()
+        return _index
+
+
+def invalidate():
+    ''' Drops the shared game window index so that it is rebuilt
+        on next use. Called when the schedule changes.
+    '''
+    global _index
+    with _lock:
+        _index = None
+
+
+class Windows:
+    ''' In-memory interval index of game windows by teamid.
+        Each window spans from one hour before to four hours after
+        the scheduled start time of a game.
+    '''
+    def __init__(self):
+
+        # Windows by teamid
+        self.teams = {}
+
+        # Home and away teams by gameid
+        self.games = {}
+
+        # Build time of the index
+        self.built = datetime.utcnow()
+
+        self._build()
+
+    def _build(self):
+        ''' Builds the sorted game windows for each team from the
+            games collection
+        '''
+        result = ff.db.games.find({}, {'gameid': 1, 'hometeam': 1,
+                                       'awayteam': 1, 'scheduled': 1,
+                                       '_id': 0})
+
+        # Collect windows for home and away teams
+        windows = {}
+        for game in result:
+            if not game.get('gameid') or not game.get('scheduled'):
+                continue
+
+            self.games[game['gameid']] = {
+                'hometeam': game.get('hometeam'),
+                'awayteam': game.get('awayteam')
+            }
+
+            start = game['scheduled'] - PREGAME
+            end = game['scheduled'] + POSTGAME
+            for team in [game.get('hometeam'), game.get('awayteam')]:
+                if team:
+                    windows.setdefault(team, []).append(
+                        (start, end, game['gameid']))
+
+        # Sort windows by start time
+        for team in windows:
+            rows = sorted(windows[team])
+            self.teams[team] = {
+                'start': [_[0] for _ in rows],
+                'end': [_[1] for _ in rows],
+                'gameid': [_[2] for _ in rows],
+                'starts': np.array([_[0] for _ in rows],
+                                   dtype='datetime64[us]'),
+                'ends': np.array([_[1] for _ in rows],
+                                 dtype='datetime64[us]')
+            }
+
+    def gameid(self, teamid, postedtime):
+        ''' Returns the gameid whose window contains the posted time
+            for a team, or None if no game matches
+        '''
+        windows = self.teams.get(teamid)
+        if windows is None:
+            return None
+
+        # Latest window starting at or before the posted time
+        i = bisect_right(windows['start'], postedtime) - 1
+        if i >= 0 and windows['end'][i] >= postedtime:
+            return windows['gameid'][i]
+        return None
+
+    def gameids(self, pairs):
+        ''' Returns a list of gameids for a sequence of
+            (teamid, postedtime) pairs
+        '''
+        pairs = list(pairs)
+        result = np.empty(len(pairs), dtype=object)
+        if not pairs:
+            return list(result)
+
+        teamids = np.array([_[0] for _ in pairs], dtype=object)
+        times = np.array([_[1] for _ in pairs], dtype='datetime64[us]')
+
+        # Search the windows of each team in one pass
+        for team in set(teamids):
+            mask = teamids == team
+            windows = self.teams.get(team)
+            if windows is None:
+                continue
+
+            i = np.searchsorted(windows['starts'], times[mask],
+                                side='right') - 1
+            found = i >= 0
+            found[found] = windows['ends'][i[found]] >= times[mask][found]
+
+            gameids = np.array(windows['gameid'] + [None], dtype=object)
+            result[mask] = np.where(found, gameids[i], None)
+
+        return list(result)
+
+    def side(self, gameid, teamid):
+        ''' Returns hometeam or awayteam for a team in a game, or
+            None if the team is not playing in the game
+        '''
+        game = self.games.get(gameid)
+        if game:
+            for side in ['hometeam', 'awayteam']:
+                if game[side] == teamid:
+                    return side
+        return None
@@ -2,4 +2,4 @@
 from app import app
 
 if __name__ == '__main__':
-	app.run(host='0.0.0.0',  port=5000)
\ No newline at end of file
+	app.run(host='0.0.0.0',  port=5000, threaded=True)
\ No newline at end of file